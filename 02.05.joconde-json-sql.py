@@ -1,8 +1,10 @@
-import polars as pl
 import outils
-from sqlalchemy import MetaData, Table, Column, String, Text, create_engine, insert, delete
+import extraction
+import chargement
+import connexion
+from sqlalchemy import MetaData, Table, Column, String, Text, delete
 from dotenv import load_dotenv
-import logging, os
+import logging
 import yaml
 
 with open("config.yaml", "r") as f:
@@ -17,23 +19,14 @@ load_dotenv()
 
 @outils.chronometre_logging
 def charger_fichier(path):
-    """Charge le fichier JSON - inférence complète du schéma"""
-    return pl.read_json(path, infer_schema_length=None)
+    """Lit le fichier JSON lot par lot - mémoire bornée quelle que soit la taille"""
+    return extraction.lire_json_par_lots(path)
 
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
-df = charger_fichier(fichier)
-
-logging.info(f"📊 {len(df)} lignes chargées")
-logging.info(f"📋 Colonnes disponibles : {df.columns}")
+lots = charger_fichier(fichier)
 
 # Connexion PostgreSQL Airflow
-engine = create_engine(
-    f"postgresql://{os.getenv('POSTGRES_USER', 'airflow')}:"
-    f"{os.getenv('POSTGRES_PASSWORD', 'airflow')}@"
-    f"{os.getenv('POSTGRES_HOST', 'localhost')}:"
-    f"{os.getenv('POSTGRES_PORT', '5434')}/"
-    f"{os.getenv('POSTGRES_DB', 'joconde')}"
-)
+engine = connexion.moteur_config(config)
 
 logging.info("🐳 Connexion à PostgreSQL Airflow")
 
@@ -56,25 +49,16 @@ joconde_table = Table(
 metadata.create_all(engine)
 logging.info("✅ Table 'joconde' créée ou déjà existante")
 
-# Sélectionner uniquement les colonnes qui existent dans la table
-colonnes_table = ["reference", "appellation", "auteur", "date_creation", 
-                  "denomination", "region", "departement", "ville", "description"]
-
-# Filtrer les colonnes qui existent dans le DataFrame
-colonnes_existantes = [col for col in colonnes_table if col in df.columns]
-logging.info(f"📌 Colonnes sélectionnées : {colonnes_existantes}")
-
-df_filtered = df.select(colonnes_existantes)
-records = df_filtered.to_dicts()
-
-logging.info(f"📤 Préparation de {len(records)} enregistrements")
-
 with engine.begin() as conn:
     conn.execute(delete(joconde_table))
     logging.info("🗑️  Table vidée")
-    outils.chronometre_logging_lambda("Import PostgreSQL", lambda: conn.execute(insert(joconde_table), records))
 
-logging.info("✅ Données importées dans PostgreSQL Airflow")
+    # Chaque lot est copié (COPY FROM STDIN) dès qu'il est lu, sans attendre la fin du fichier
+    total = outils.chronometre_logging_lambda(
+        "Import PostgreSQL", lambda: chargement.copier(conn, lots, "joconde")
+    )
+
+logging.info(f"✅ {total} lignes importées dans PostgreSQL Airflow")
 
 # Vérification
 with engine.connect() as conn:
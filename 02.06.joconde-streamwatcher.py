@@ -1,8 +1,9 @@
-import polars as pl
 import outils
-from sqlalchemy import MetaData, Table, Column, String, Text, create_engine, insert, text
+import connexion
+import flux_joconde
+from sqlalchemy import MetaData, Table, Column, String, Text
 from dotenv import load_dotenv
-import logging, os, shutil, time, json
+import logging, os, time
 import yaml
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -17,33 +18,11 @@ logging.basicConfig(
 
 load_dotenv()
 
-# Créer la base de données si elle n'existe pas
-admin_engine = create_engine(
-    f"postgresql://{os.getenv('POSTGRES_USER', 'airflow')}:"
-    f"{os.getenv('POSTGRES_PASSWORD', 'airflow')}@"
-    f"{os.getenv('POSTGRES_HOST', 'localhost')}:"
-    f"{os.getenv('POSTGRES_PORT', '5434')}/"
-    f"airflow"
-)
-
-with admin_engine.connect() as conn:
-    conn.execution_options(isolation_level="AUTOCOMMIT")
-    result = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = 'joconde'"))
-    if not result.fetchone():
-        logging.info("🔨 Création de la base de données 'joconde'")
-        conn.execute(text("CREATE DATABASE joconde"))
-        logging.info("✅ Base de données 'joconde' créée")
-
-admin_engine.dispose()
+# Créer la base de données si elle n'existe pas (une fois par processus)
+connexion.assurer_base()
 
 # Connexion PostgreSQL
-engine = create_engine(
-    f"postgresql://{os.getenv('POSTGRES_USER', 'airflow')}:"
-    f"{os.getenv('POSTGRES_PASSWORD', 'airflow')}@"
-    f"{os.getenv('POSTGRES_HOST', 'localhost')}:"
-    f"{os.getenv('POSTGRES_PORT', '5434')}/"
-    f"{os.getenv('POSTGRES_DB', 'joconde')}"
-)
+engine = connexion.moteur_config(config)
 
 metadata = MetaData()
 
@@ -64,65 +43,73 @@ joconde_table = Table(
 metadata.create_all(engine)
 logging.info("✅ Table 'joconde' prête")
 
-# --- Traitement d'un fichier JSON ---
-def traiter_fichier(filepath):
-    logging.info(f"📥 Nouveau fichier détecté : {filepath}")
-    try:
-        with open(filepath, encoding="utf-8") as f:
-            data = json.load(f)
-        
-        with engine.begin() as conn:
-            for i, record in enumerate(data):
-                try:
-                    row = {
-                        "reference": record.get("reference"),
-                        "appellation": record.get("appellation"),
-                        "auteur": record.get("auteur"),
-                        "date_creation": record.get("date_creation"),
-                        "denomination": record.get("denomination"),
-                        "region": record.get("region"),
-                        "departement": record.get("departement"),
-                        "ville": record.get("ville"),
-                        "description": record.get("description"),
-                    }
-                    conn.execute(insert(joconde_table).values(**row))
-                    
-                    if (i + 1) % 1000 == 0:
-                        logging.info(f"✅ {i+1}/{len(data)} lignes insérées")
-                        
-                except Exception as e:
-                    logging.exception(f"❌ Erreur ligne {i+1}: {e}")
-        
-        logging.info(f"✅ {len(data)} lignes insérées au total")
-        
-        # Déplacer le fichier une fois traité
-        archive_path = os.path.join(config["watchdog"]["archive_directory"], os.path.basename(filepath))
-        shutil.move(filepath, archive_path)
-        logging.info(f"📦 Fichier archivé : {archive_path}")
-        
-    except Exception as e:
-        logging.exception(f"❌ Erreur de traitement : {e}")
+# --- Journal d'ingestion ---
+# Empreinte SHA-256 de chaque fichier validée dans la même transaction que ses lignes :
+# après un redémarrage, un fichier déjà chargé (même renommé) est archivé sans être rechargé
+reglages = config["watchdog"]
+journal = flux_joconde.Journal(engine, reglages.get("table_journal", flux_joconde.TABLE_JOURNAL)).creer_table().charger()
+
+# --- Écriture par micro-lots ---
+# Les lignes des fichiers sont regroupées et écrites par COPY dès que N lignes ou T ms sont atteints ;
+# un fichier n'est archivé qu'une fois ses lignes validées en base
+ingesteur = flux_joconde.Ingesteur(
+    engine,
+    reglages["archive_directory"],
+    nb_lignes_max=reglages.get("nb_lignes_max", flux_joconde.NB_LIGNES_MAX),
+    delai_max_ms=reglages.get("delai_max_ms", flux_joconde.DELAI_MAX_MS),
+    taille_file=reglages.get("taille_file", flux_joconde.TAILLE_FILE),
+    journal=journal,
+)
+
+# --- Analyse des fichiers complets sur un pool ---
+repartiteur = flux_joconde.Repartiteur(
+    ingesteur,
+    nb_workers=reglages.get("nb_workers", flux_joconde.NB_WORKERS),
+    processus=reglages.get("pool", "threads") == "processus",
+    fichiers_en_cours=reglages.get("fichiers_en_cours", flux_joconde.FICHIERS_EN_COURS),
+)
+# Un fichier est complet quand son témoin ".pret" est déposé, quand il est renommé à sa place
+# définitive, ou quand sa taille et sa date ne bougent plus depuis `stabilite_ms`
+detecteur = flux_joconde.Detecteur(
+    repartiteur,
+    stabilite_ms=reglages.get("stabilite_ms", flux_joconde.STABILITE_MS),
+    intervalle_ms=reglages.get("intervalle_ms", flux_joconde.INTERVALLE_MS),
+)
 
 # --- Gestionnaire d'événements ---
 class Handler(FileSystemEventHandler):
     def on_created(self, event):
-        if event.is_directory or not event.src_path.endswith(".json"):
+        if event.is_directory:
             return
-        time.sleep(1)  # attendre que le fichier soit totalement écrit
-        traiter_fichier(event.src_path)
+        if event.src_path.endswith(".json" + flux_joconde.MARQUEUR):
+            detecteur.pret(event.src_path[:-len(flux_joconde.MARQUEUR)])
+        elif event.src_path.endswith(".json"):
+            logging.info(f"📥 Nouveau fichier détecté : {event.src_path}")
+            detecteur.signaler(event.src_path)
+
+    def on_moved(self, event):
+        # Écriture dans un fichier temporaire puis renommage : le fichier est complet à l'arrivée
+        if not event.is_directory and event.dest_path.endswith(".json"):
+            logging.info(f"📥 Nouveau fichier déposé : {event.dest_path}")
+            detecteur.pret(event.dest_path)
 
 # --- Mise en place de l'observateur ---
 if __name__ == "__main__":
     os.makedirs(config["watchdog"]["input_directory"], exist_ok=True)
     os.makedirs(config["watchdog"]["archive_directory"], exist_ok=True)
     
+    ingesteur.demarrer()
+    detecteur.demarrer()
     observer = Observer()
     observer.schedule(Handler(), path=config["watchdog"]["input_directory"], recursive=False)
     observer.start()
     
-    logging.info(f"👀 Surveillance du dossier '{config['watchdog']['input_directory']}' pour les nouveaux fichiers JSON...")
-    
     try:
+        # Fichiers déposés pendant l'arrêt : traités avant de passer au fil de l'eau. L'observateur est déjà
+        # démarré, aucun dépôt n'est manqué ; un fichier vu par les deux voies n'est traité qu'une fois
+        flux_joconde.rattraper(config["watchdog"]["input_directory"], detecteur, ordre=reglages.get("ordre_rattrapage", "nom"))
+
+        logging.info(f"👀 Surveillance du dossier '{config['watchdog']['input_directory']}' pour les nouveaux fichiers JSON...")
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
@@ -130,4 +117,8 @@ if __name__ == "__main__":
         observer.stop()
     
     observer.join()
+    # Les fichiers détectés sont analysés, puis leurs lignes écrites (et les fichiers archivés) avant de quitter
+    detecteur.arreter()
+    repartiteur.arreter()
+    ingesteur.arreter()
     logging.info("✅ Programme terminé")
\ No newline at end of file
@@ -1,47 +1,169 @@
 import json
+import math
 import os
+import random
+import sys
+import threading
 import time
-from pathlib import Path
 from datetime import datetime
 import yaml
+import connexion
+import flux_joconde
 
 with open("config.yaml", "r") as f:
     config = yaml.safe_load(f)
 
-# Configuration
-fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'  # Chemin macOS
-BATCH_SIZE = 10          # nombre d'enregistrements par fichier
-INTERVAL_SECONDS = 5     # délai entre chaque dépôt de fichier
+# Configuration (section `simulateur` de config.yaml) : par défaut, 10 notices toutes les 5 secondes
+reglages = config.get("simulateur", {})
+fichier = reglages.get("source", config["fichiers"]["source"])
+dossier = config["watchdog"]["input_directory"]
+FICHIERS_PAR_S = reglages.get("fichiers_par_s", 0.2)   # cadence visée (0 : au plus vite)...
+LIGNES_PAR_S = reglages.get("lignes_par_s")             # ... ou débit de notices visé (prioritaire)
+TAILLE_LOT = reglages.get("taille_lot", {"loi": "fixe", "moyenne": 10})  # notices par fichier
+NB_ECRIVAINS = reglages.get("nb_ecrivains", 1)          # écrivains simultanés, chacun à sa part de la cadence
+DUREE_S = reglages.get("duree_s")                       # None : un seul passage sur la source
+FORMAT = reglages.get("format", "indente")              # indente, compact ou ndjson
+ECRITURE = reglages.get("ecriture", "direct")           # direct, renommage (fichier .tmp) ou marqueur (.pret)
+GRAINE = reglages.get("graine", 0)
+
+# Mode rapport : latences et débit mesurés sur le journal d'ingestion du watcher
+if len(sys.argv) > 1 and sys.argv[1] == "rapport":
+    import logging
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    flux_joconde.rapport_latence(
+        connexion.moteur_config(config),
+        session=sys.argv[2] if len(sys.argv) > 2 else None,
+        table=config["watchdog"].get("table_journal", flux_joconde.TABLE_JOURNAL),
+    )
+    sys.exit(0)
+
+
+def tirer_taille(rng, loi):
+    """Nombre de notices d'un fichier : fixe, uniforme, exponentielle ou lognormale (moyenne, min, max, sigma)"""
+    moyenne = loi.get("moyenne", 10)
+    if loi.get("loi") == "uniforme":
+        taille = rng.randint(loi.get("min", 1), loi.get("max", 2 * moyenne))
+    elif loi.get("loi") == "exponentielle":
+        taille = round(rng.expovariate(1 / moyenne))
+    elif loi.get("loi") == "lognormale":
+        # Paramètres choisis pour que la moyenne de la loi soit `moyenne`
+        sigma = loi.get("sigma", 1.0)
+        taille = round(rng.lognormvariate(math.log(moyenne) - sigma**2 / 2, sigma))
+    else:
+        taille = moyenne
+    return max(loi.get("min", 1), min(taille, loi.get("max", taille)))
+
+
+class Source:
+    """Notices de la source distribuées aux écrivains ; rejouées en boucle si une durée est fixée"""
+
+    def __init__(self, notices, en_boucle):
+        self.notices, self.en_boucle = notices, en_boucle
+        self.position, self.tour = 0, 0
+        self.verrou = threading.Lock()
+
+    def prendre(self, nombre):
+        with self.verrou:
+            if self.position >= len(self.notices):
+                if not self.en_boucle:
+                    return []
+                self.position, self.tour = 0, self.tour + 1
+            lot = self.notices[self.position:self.position + nombre]
+            self.position += len(lot)
+            tour = self.tour
+        if tour:
+            # Contenu inédit à chaque tour : le journal du watcher écarterait sinon les fichiers rejoués
+            lot = [{**notice, "reference": f"{notice.get('reference')}-{tour}"} for notice in lot]
+        return lot
+
+
+def serialiser(notices):
+    if FORMAT == "ndjson":
+        texte = "".join(json.dumps(n, ensure_ascii=False, separators=(",", ":")) + "\n" for n in notices)
+    elif FORMAT == "compact":
+        texte = json.dumps(notices, ensure_ascii=False, separators=(",", ":"))
+    else:
+        texte = json.dumps(notices, ensure_ascii=False, indent=2)
+    return texte.encode("utf-8")
+
+
+def deposer(chemin, contenu):
+    """Écrit le fichier ; avec renommage ou marqueur, le watcher ne voit jamais un fichier incomplet"""
+    cible = f"{chemin}.tmp" if ECRITURE == "renommage" else chemin
+    with open(cible, "wb") as f_out:
+        f_out.write(contenu)
+    if ECRITURE == "renommage":
+        os.replace(cible, chemin)
+    elif ECRITURE == "marqueur":
+        open(chemin + flux_joconde.MARQUEUR, "w").close()
+
+
+def intervalle(nb_notices):
+    """Délai d'un écrivain avant son fichier suivant, pour tenir la cadence visée à plusieurs"""
+    if LIGNES_PAR_S:
+        return nb_notices * NB_ECRIVAINS / LIGNES_PAR_S
+    return NB_ECRIVAINS / FICHIERS_PAR_S if FICHIERS_PAR_S else 0.0
+
+
+# Un dépôt affiché par ligne tant que chaque écrivain dépose au plus un fichier par seconde
+DETAILLE = intervalle(TAILLE_LOT.get("moyenne", 10)) >= 1
+
+
+def ecrire(numero_ecrivain, source, fin, bilan):
+    rng = random.Random(GRAINE + numero_ecrivain)
+    prochain = time.perf_counter()
+    numero = 0
+    while fin is None or time.perf_counter() < fin:
+        notices = source.prendre(tirer_taille(rng, TAILLE_LOT))
+        if not notices:
+            break
+        contenu = serialiser(notices)
+        # Échéances absolues : un dépôt en retard ne décale pas les suivants
+        attente = prochain - time.perf_counter()
+        if attente > 0:
+            time.sleep(attente)
+        cree_ns = time.time_ns()
+        nom = flux_joconde.nom_fichier(SESSION, numero_ecrivain, numero, cree_ns)
+        deposer(os.path.join(dossier, nom), contenu)
+        with bilan["verrou"]:
+            bilan["fichiers"] += 1
+            bilan["notices"] += len(notices)
+            bilan["retard_max"] = max(bilan["retard_max"], -attente)
+        if DETAILLE:
+            print(f"✅ {nom} ({len(notices)} notices)")
+        numero += 1
+        prochain += intervalle(len(notices))
+
 
 # Préparer le répertoire de sortie
-os.makedirs(config["watchdog"]["input_directory"], exist_ok=True)
+os.makedirs(dossier, exist_ok=True)
 
 # Charger les données sources
 print(f"📖 Chargement du fichier : {fichier}")
 with open(fichier, encoding="utf-8") as f:
     data = json.load(f)
 
+SESSION = datetime.now().strftime("%Y%m%d%H%M%S")
+cadence = f"{LIGNES_PAR_S} notices/s" if LIGNES_PAR_S else (f"{FICHIERS_PAR_S} fichiers/s" if FICHIERS_PAR_S else "au plus vite")
 print(f"📊 {len(data)} enregistrements chargés")
-print(f"📦 Création de {len(data) // BATCH_SIZE + 1} fichiers batch")
-print(f"⏱️  Intervalle entre fichiers : {INTERVAL_SECONDS} secondes")
+print(f"⏱️  Session {SESSION} : {cadence}, {NB_ECRIVAINS} écrivains, lots {TAILLE_LOT}, format {FORMAT}, écriture {ECRITURE}"
+      + (f", pendant {DUREE_S} s" if DUREE_S else ""))
 print("-" * 60)
 
-# Découpe en lots et export
-for i in range(0, len(data), BATCH_SIZE):
-    batch = data[i:i+BATCH_SIZE]
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    batch_num = i // BATCH_SIZE + 1
-    filename = f"joconde_batch_{batch_num:05d}_{timestamp}.json"
-    filepath = Path(config["watchdog"]["input_directory"]) / filename
-    
-    with open(filepath, "w", encoding="utf-8") as f_out:
-        json.dump(batch, f_out, ensure_ascii=False, indent=2)
-    
-    print(f"✅ Batch {batch_num}: {filepath.name} ({len(batch)} notices)")
-    
-    # Ne pas attendre après le dernier fichier
-    if i + BATCH_SIZE < len(data):
-        time.sleep(INTERVAL_SECONDS)
+source = Source(data, en_boucle=DUREE_S is not None)
+bilan = {"fichiers": 0, "notices": 0, "retard_max": 0.0, "verrou": threading.Lock()}
+debut = time.perf_counter()
+fin = debut + DUREE_S if DUREE_S else None
+ecrivains = [threading.Thread(target=ecrire, args=(n, source, fin, bilan)) for n in range(NB_ECRIVAINS)]
+for ecrivain in ecrivains:
+    ecrivain.start()
+for ecrivain in ecrivains:
+    ecrivain.join()
+duree = time.perf_counter() - debut
 
 print("-" * 60)
-print(f"✅ Terminé ! {len(data)} enregistrements répartis en {batch_num} fichiers")
\ No newline at end of file
+print(f"✅ Terminé ! {bilan['notices']} notices réparties en {bilan['fichiers']} fichiers en {duree:.1f}s "
+      f"({bilan['fichiers'] / max(duree, 1e-6):,.1f} fichiers/s, {bilan['notices'] / max(duree, 1e-6):,.0f} notices/s)")
+if bilan["retard_max"] > 1:
+    print(f"⚠️  Cadence non tenue : jusqu'à {bilan['retard_max']:.1f}s de retard sur l'échéancier")
+print(f"📈 Latences d'ingestion : python {os.path.basename(__file__)} rapport {SESSION}")
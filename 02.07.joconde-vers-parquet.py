@@ -1,5 +1,7 @@
 import polars as pl
 import os
+import yaml
+import parquet_joconde
 
 def taille_fichier(path):
     """Retourne la taille d'un fichier en Mo"""
@@ -10,32 +12,41 @@ def taille_fichier(path):
 # Chemins macOS
 fichier_json = '/Users/macbook/Downloads/base-joconde-extrait.json'
 fichier_parquet = '/Users/macbook/Downloads/joconde.parquet'
+dossier_partitionne = '/Users/macbook/Downloads/joconde_partitionne'
 
-print("📖 Chargement du fichier JSON...")
-df = pl.read_json(
-    fichier_json, 
-    infer_schema_length=None  # Scanner tout le fichier pour éviter les erreurs
-)
+# Réglages du fichier Parquet (codec, niveau, row groups...) : section `parquet` de config.yaml,
+# à choisir à partir des mesures de `python parquet_joconde.py`
+with open("config.yaml", "r") as f:
+    reglages = (yaml.safe_load(f) or {}).get("parquet", {})
 
-print(f"📊 {len(df)} lignes chargées")
-print(f"📋 Colonnes disponibles : {len(df.columns)} colonnes")
-
-# Sélectionner les colonnes
-df = df.select([
+colonnes = [
     "reference", "appellation", "auteur",
     "date_creation", "denomination", "region",
     "departement", "ville", "description"
-])
-
-print(f"✂️  Colonnes sélectionnées : {df.columns}")
+]
+print(f"✂️  Colonnes sélectionnées : {colonnes}")
 
-print("💾 Écriture du fichier Parquet...")
-df.write_parquet(fichier_parquet, compression="snappy")
+print("💾 Conversion en flux du JSON vers Parquet...")
+nb_lignes = parquet_joconde.convertir(fichier_json, fichier_parquet, colonnes=colonnes, **reglages)
+print(f"📊 {nb_lignes} lignes écrites")
 
 print("✅ Vérification : rechargement du fichier Parquet")
 df_recharge = pl.read_parquet(fichier_parquet)
 print(df_recharge.head())
 
+print("🗂️  Export partitionné par région / département...")
+nb_partitions = parquet_joconde.ecrire_dataset(df_recharge, dossier_partitionne, **reglages)
+print(f"📁 {nb_partitions} partitions écrites dans {dossier_partitionne}")
+
+# Requête régionale : seuls les fichiers de la région sont ouverts
+region = df_recharge["region"].drop_nulls().head(1).to_list()
+if region:
+    df_region = parquet_joconde.scanner_dataset(
+        dossier_partitionne, pl.col("region") == region[0]
+    ).group_by("departement").agg(pl.count().alias("nombre_oeuvres")).collect()
+    print(f"📍 {region[0]} :")
+    print(df_region)
+
 print("\n" + "="*60)
 print(f"📄 Taille du fichier JSON     : {taille_fichier(fichier_json)} Mo")
 print(f"📦 Taille du fichier Parquet  : {taille_fichier(fichier_parquet)} Mo")
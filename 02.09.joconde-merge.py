@@ -1,10 +1,12 @@
 import polars as pl
 import outils
-from sqlalchemy import MetaData, Table, Column, String, Text, create_engine, insert, delete
+import cache_feather
+import chargement
+import connexion
+import filigrane
 from dotenv import load_dotenv
 import logging, os
 import yaml
-from datetime import date
 
 with open("config.yaml", "r") as f:
     config = yaml.safe_load(f)
@@ -17,64 +19,65 @@ logging.basicConfig(
 load_dotenv()
 
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
+fichier_cache = "/Users/macbook/Downloads/joconde_cache.feather"
 
-logging.info("📖 Chargement du fichier JSON...")
-df = pl.read_json(
-    fichier, 
-    infer_schema_length=None  # Scanner tout le fichier
-)
+# Un filigrane par source : la date de mise à jour la plus récente déjà chargée
+source = config["audit"]["source_system"]
+table_cible = "joconde"
+colonnes = ["reference", "appellation", "auteur", "date_creation",
+            "denomination", "region", "departement", "ville", "description"]
 
-logging.info(f"📊 {len(df)} lignes chargées")
+logging.info("📖 Chargement du fichier JSON (via le cache feather)...")
+lf = cache_feather.scanner(fichier, fichier_cache, **config.get("cache", {}))
 
 # Afficher la liste des colonnes
-logging.info(f"📋 Colonnes disponibles ({len(df.columns)}) : {df.columns}")
-
-# Sélectionner les colonnes
-df = df.select(["reference", "appellation", "ville", "date_de_mise_a_jour"])
-logging.info("✂️  Colonnes sélectionnées : reference, appellation, ville, date_de_mise_a_jour")
-
-print("\n📄 Aperçu des 10 premières lignes :")
-print(df.head(10))
-
-# Convertir la colonne en type date (gestion des erreurs)
-logging.info("📅 Conversion de la colonne date_de_mise_a_jour en type Date...")
-
-df = df.with_columns(
-    pl.col("date_de_mise_a_jour")
-    .str.strptime(pl.Date, "%Y-%m-%d", strict=False)  # strict=False pour ignorer les erreurs
-)
-
-# Compter les valeurs nulles après conversion
-nb_nulls = df.filter(pl.col("date_de_mise_a_jour").is_null()).height
-logging.info(f"⚠️  {nb_nulls} dates invalides ou nulles détectées")
-
-# Trouver la date maximale
-max_date = df.select(pl.col("date_de_mise_a_jour").max()).to_series()[0]
-min_date = df.select(pl.col("date_de_mise_a_jour").min()).to_series()[0]
-
-logging.info(f"📊 Statistiques des dates :")
-logging.info(f"  - Date minimale : {min_date}")
-logging.info(f"  - Date maximale : {max_date}")
-
-# Filtrer les enregistrements après une date seuil
-date_seuil = date(2025, 5, 1)
-logging.info(f"🔍 Filtrage des enregistrements après le {date_seuil}")
-
-df_filtre = df.filter(
-    pl.col("date_de_mise_a_jour") > date_seuil
-)
-
-logging.info(f"✅ {len(df_filtre)} enregistrements après le {date_seuil}")
-logging.info(f"📉 Ratio : {round(len(df_filtre) / len(df) * 100, 2)}% des données conservées")
-
-print("\n📄 Aperçu des 10 premières lignes filtrées :")
-print(df_filtre.head(10))
+logging.info(f"📋 Colonnes disponibles ({len(lf.columns)}) : {lf.columns}")
+
+engine = connexion.moteur_config(config)
+
+with engine.begin() as conn:
+    filigrane.creer_table(conn)
+
+# Lecture du filigrane, upsert et avancement du filigrane dans une seule transaction :
+# un échec n'avance jamais le filigrane au-delà des données réellement chargées
+with engine.begin() as conn:
+    date_seuil = filigrane.lire(conn, source)
+    if date_seuil is None:
+        logging.info("🆕 Aucun filigrane : chargement complet")
+    else:
+        logging.info(f"🔍 Notices mises à jour depuis le {date_seuil}")
+
+    # Seules les colonnes sélectionnées sont lues depuis le cache, et seules les lignes après le filigrane sont gardées
+    df_filtre = (
+        filigrane.filtrer(lf.select(colonnes + [filigrane.COLONNE_DATE]), date_seuil)
+        .sort(filigrane.COLONNE_DATE, nulls_last=False)
+        .collect()
+    )
+    logging.info(f"✅ {len(df_filtre)} enregistrements à charger")
+
+    print("\n📄 Aperçu des 10 premières lignes filtrées :")
+    print(df_filtre.head(10))
+
+    # Statistiques des dates
+    max_date = df_filtre.select(pl.col(filigrane.COLONNE_DATE).max()).to_series()[0]
+    min_date = df_filtre.select(pl.col(filigrane.COLONNE_DATE).min()).to_series()[0]
+    nb_nulls = df_filtre.filter(pl.col(filigrane.COLONNE_DATE).is_null()).height
+    logging.info(f"📊 Statistiques des dates :")
+    logging.info(f"  - Date minimale : {min_date}")
+    logging.info(f"  - Date maximale : {max_date}")
+    logging.info(f"⚠️  {nb_nulls} dates invalides ou nulles détectées")
+
+    total = outils.chronometre_logging_lambda(
+        "Upsert PostgreSQL",
+        lambda: chargement.fusionner(conn, df_filtre, table_cible, cle="reference")
+    )
+    filigrane.avancer(conn, source, max_date, total)
 
 # Statistiques supplémentaires
 print("\n📊 Répartition par année :")
 df_avec_annee = df_filtre.with_columns(
-    pl.col("date_de_mise_a_jour").dt.year().alias("annee")
+    pl.col(filigrane.COLONNE_DATE).dt.year().alias("annee")
 )
 print(df_avec_annee.group_by("annee").agg(
     pl.count().alias("nombre")
-).sort("annee"))
\ No newline at end of file
+).sort("annee"))
@@ -1,8 +1,10 @@
-import polars as pl
 import outils
-from sqlalchemy import MetaData, Table, Column, String, Text, DateTime, create_engine, insert, delete, text
+import extraction
+import chargement
+import connexion
+from sqlalchemy import MetaData, Table, Column, String, Text, DateTime, delete, text
 from dotenv import load_dotenv
-import logging, os
+import logging
 import yaml
 from datetime import datetime, timezone
 
@@ -18,42 +20,17 @@ load_dotenv()
 
 @outils.chronometre_logging
 def charger_fichier(path):
-    """Charge le fichier JSON avec Polars"""
-    return pl.read_json(path, infer_schema_length=None)
+    """Lit le fichier JSON lot par lot avec Polars"""
+    return extraction.lire_json_par_lots(path)
 
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
-df = charger_fichier(fichier)
+lots = charger_fichier(fichier)
 
-logging.info(f"📊 {len(df)} lignes chargées")
-
-# Créer la base de données si elle n'existe pas
-admin_engine = create_engine(
-    f"postgresql://{os.getenv('POSTGRES_USER', 'airflow')}:"
-    f"{os.getenv('POSTGRES_PASSWORD', 'airflow')}@"
-    f"{os.getenv('POSTGRES_HOST', 'localhost')}:"
-    f"{os.getenv('POSTGRES_PORT', '5434')}/"
-    f"airflow"
-)
-
-with admin_engine.connect() as conn:
-    conn.execution_options(isolation_level="AUTOCOMMIT")
-    result = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = 'joconde'"))
-    if not result.fetchone():
-        logging.info("🔨 Création de la base de données 'joconde'")
-        conn.execute(text("CREATE DATABASE joconde"))
-        logging.info("✅ Base de données 'joconde' créée")
-
-admin_engine.dispose()
+# Créer la base de données si elle n'existe pas (une fois par processus)
+connexion.assurer_base()
 
 # Connexion PostgreSQL
-engine = create_engine(
-    f"postgresql://{os.getenv('POSTGRES_USER', 'airflow')}:"
-    f"{os.getenv('POSTGRES_PASSWORD', 'airflow')}@"
-    f"{os.getenv('POSTGRES_HOST', 'localhost')}:"
-    f"{os.getenv('POSTGRES_PORT', '5434')}/"
-    f"{os.getenv('POSTGRES_DB', 'joconde')}",
-    executemany_mode='values_plus_batch'  # Équivalent de fast_executemany
-)
+engine = connexion.moteur_config(config)
 
 logging.info("🐳 Connexion à PostgreSQL Airflow")
 
@@ -84,36 +61,23 @@ logging.info("✅ Table 'joconde' créée avec colonnes d'audit")
 colonnes_metier = ["reference", "appellation", "auteur", "date_creation", 
                    "denomination", "region", "departement", "ville", "description"]
 
-colonnes_existantes = [col for col in colonnes_metier if col in df.columns]
-logging.info(f"📌 Colonnes métier sélectionnées : {colonnes_existantes}")
-
-df_filtered = df.select(colonnes_existantes)
-
 # Ajouter les colonnes d'audit
 load_timestamp = datetime.now(timezone.utc)
 logging.info(f"🕐 Timestamp UTC : {load_timestamp}")
 
-records = [
-    {
-        **row,
-        "source_system": config["audit"]["source_system"],
-        "load_timestamp_utc": load_timestamp,
-        "load_process": config["audit"]["load_process"]
-    }
-    for row in df_filtered.to_dicts()
-]
-
-logging.info(f"📤 Préparation de {len(records)} enregistrements avec métadonnées d'audit")
-
 with engine.begin() as conn:
     conn.execute(delete(joconde_table))
     logging.info("🗑️  Table vidée")
-    outils.chronometre_logging_lambda(
-        "Import PostgreSQL", 
-        lambda: conn.execute(insert(joconde_table), records)
+
+    # Colonnes métier copiées telles quelles (COPY FROM STDIN) ; les colonnes d'audit
+    # sont des constantes ajoutées tranche par tranche, jamais matérialisées ligne à ligne
+    audit = {**chargement.colonnes_audit(config), "load_timestamp_utc": load_timestamp}
+    lots_metier = (df.select([col for col in colonnes_metier if col in df.columns]) for df in lots)
+    total = outils.chronometre_logging_lambda(
+        "Import PostgreSQL", lambda: chargement.copier(conn, lots_metier, "joconde", constantes=audit)
     )
 
-logging.info("✅ Données importées avec métadonnées d'audit")
+logging.info(f"✅ {total} lignes importées avec métadonnées d'audit")
 
 # Vérification avec détails d'audit
 with engine.connect() as conn:
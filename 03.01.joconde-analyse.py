@@ -1,4 +1,5 @@
 import polars as pl
+import cache_feather
 import logging, yaml, os, locale
 
 # Définir le format local (français standard)
@@ -23,19 +24,8 @@ logging.basicConfig(
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
 fichier_cache = "/Users/macbook/Downloads/joconde_cache.feather"
 
-# Chargement avec cache
-if os.path.exists(fichier_cache):
-    print("📦 Chargement depuis le cache feather...")
-    df = pl.read_ipc(fichier_cache)
-    print(f"✅ Chargé en {os.path.getsize(fichier_cache) / (1024**2):.2f} Mo")
-else:
-    print("📥 Chargement depuis le JSON source...")
-    df = pl.read_json(fichier, infer_schema_length=None)
-    
-    # Sauvegarde rapide en cache
-    print("💾 Sauvegarde du cache feather...")
-    df.write_ipc(fichier_cache)
-    print(f"✅ Cache créé : {os.path.getsize(fichier_cache) / (1024**2):.2f} Mo")
+# Chargement avec cache (invalidé automatiquement si la source change)
+df = cache_feather.charger(fichier, fichier_cache, **config.get("cache", {}))
 
 print("\n" + "="*60)
 print("📊 ANALYSE DES DONNÉES")
@@ -1,4 +1,6 @@
 import polars as pl
+import cache_feather
+import dictionnaires
 import logging, yaml, os, locale, json
 from datetime import datetime
 
@@ -24,17 +26,12 @@ logging.basicConfig(
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
 fichier_cache = "/Users/macbook/Downloads/joconde_cache.feather"
 
-# Chargement avec cache
-if os.path.exists(fichier_cache):
-    print("📦 Chargement depuis le cache feather...")
-    df = pl.read_ipc(fichier_cache)
-else:
-    print("📥 Chargement depuis le JSON source...")
-    df = pl.read_json(fichier, infer_schema_length=None)
-    
-    # Sauvegarde rapide en cache
-    print("💾 Sauvegarde du cache feather...")
-    df.write_ipc(fichier_cache)
+# Chargement avec cache (invalidé automatiquement si la source change)
+df = cache_feather.scanner(fichier, fichier_cache, **config.get("cache", {})).select([
+    "reference", "appellation", "ville", "date_creation", "region", "description"
+]).collect()
+fichier_dictionnaire = config["fichiers"].get("dictionnaire", dictionnaires.FICHIER_DICTIONNAIRE)
+df = dictionnaires.encoder(df, fichier_dictionnaire)
 
 print(f"✅ {locale.format_string('%d', len(df), grouping=True)} lignes chargées")
 
@@ -45,6 +42,8 @@ with open("config_regions.json", encoding="utf-8") as f:
 
 print(f"\n📍 {len(regions_valides)} régions valides chargées :")
 print(regions_valides)
+# Comparaison sur les codes Enum (une région absente du dictionnaire n'apparaît dans aucune notice)
+regions_valides = dictionnaires.valeurs_connues(regions_valides, "region", fichier_dictionnaire)
 
 annee_courante = datetime.now().year
 print(f"\n📅 Année courante : {annee_courante}")
@@ -110,7 +109,7 @@ if anomalies["régions_inconnues"][0] > 0:
         df.filter(pl.col("anomalie_region_inconnue"))
         .select("region")
         .unique()
-        .sort("region")
+        .sort(pl.col("region").cast(pl.Utf8))
     )
     print(f"   {len(regions_non_valides)} régions différentes non reconnues :")
     print(regions_non_valides.head(10))
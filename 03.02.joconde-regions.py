@@ -1,4 +1,6 @@
 import polars as pl
+import cache_feather
+import dictionnaires
 import logging, yaml, os, locale, json
 
 # Gestion robuste de la locale
@@ -22,17 +24,9 @@ logging.basicConfig(
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
 fichier_cache = "/Users/macbook/Downloads/joconde_cache.feather"
 
-# Chargement avec cache
-if os.path.exists(fichier_cache):
-    print("📦 Chargement depuis le cache feather...")
-    df = pl.read_ipc(fichier_cache)
-else:
-    print("📥 Chargement depuis le JSON source...")
-    df = pl.read_json(fichier, infer_schema_length=None)
-    
-    # Sauvegarde rapide en cache
-    print("💾 Sauvegarde du cache feather...")
-    df.write_ipc(fichier_cache)
+# Chargement avec cache (invalidé automatiquement si la source change)
+df = cache_feather.scanner(fichier, fichier_cache, **config.get("cache", {})).select("region").collect()
+df = dictionnaires.encoder(df, config["fichiers"].get("dictionnaire", dictionnaires.FICHIER_DICTIONNAIRE))
 
 print(f"✅ {locale.format_string('%d', len(df), grouping=True)} lignes chargées")
 
@@ -42,7 +36,7 @@ print("\n🔍 Extraction des régions uniques...")
 regions = (
     df.group_by("region")
       .len()
-      .sort("region")
+      .sort(pl.col("region").cast(pl.Utf8))  # ordre alphabétique, pas celui des codes
       .filter(pl.col("region").is_not_null())  # Exclure les valeurs nulles
       .select("region")
       .to_series()
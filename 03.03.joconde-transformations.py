@@ -1,4 +1,5 @@
 import polars as pl
+import cache_feather
 import logging, yaml, os, locale, json
 from datetime import datetime, timezone
 
@@ -23,17 +24,8 @@ logging.basicConfig(
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
 fichier_cache = "/Users/macbook/Downloads/joconde_cache.feather"
 
-# Chargement avec cache
-if os.path.exists(fichier_cache):
-    print("📦 Chargement depuis le cache feather...")
-    df = pl.read_ipc(fichier_cache)
-else:
-    print("📥 Chargement depuis le JSON source...")
-    df = pl.read_json(fichier, infer_schema_length=None)
-    
-    # Sauvegarde rapide en cache
-    print("💾 Sauvegarde du cache feather...")
-    df.write_ipc(fichier_cache)
+# Chargement avec cache (invalidé automatiquement si la source change)
+df = cache_feather.charger(fichier, fichier_cache, **config.get("cache", {}))
 
 print(f"✅ {locale.format_string('%d', len(df), grouping=True)} lignes chargées")
 
@@ -146,7 +138,7 @@ df.write_parquet(export_fichier, compression="snappy")
 print(f"✅ Fichier exporté : {export_fichier}")
 
 # Afficher la taille des fichiers
-taille_cache = os.path.getsize(fichier_cache) / (1024**2)
+taille_cache = os.path.getsize(cache_feather.assurer(fichier, fichier_cache, **config.get("cache", {}))) / (1024**2)
 taille_export = os.path.getsize(export_fichier) / (1024**2)
 print(f"\n📊 Tailles des fichiers :")
 print(f"  • Cache Feather : {taille_cache:.2f} Mo")
@@ -1,4 +1,6 @@
 import polars as pl
+import cache_feather
+import dictionnaires
 import logging, yaml, os, locale, json
 from datetime import datetime, timezone
 
@@ -23,17 +25,15 @@ logging.basicConfig(
 fichier = '/Users/macbook/Downloads/base-joconde-extrait.json'
 fichier_cache = "/Users/macbook/Downloads/joconde_cache.feather"
 
-# Chargement avec cache
-if os.path.exists(fichier_cache):
-    print("📦 Chargement depuis le cache feather...")
-    df = pl.read_ipc(fichier_cache)
-else:
-    print("📥 Chargement depuis le JSON source...")
-    df = pl.read_json(fichier, infer_schema_length=None)
-    
-    # Sauvegarde rapide en cache
-    print("💾 Sauvegarde du cache feather...")
-    df.write_ipc(fichier_cache)
+# Chargement avec cache (invalidé automatiquement si la source change)
+# Seules les colonnes utilisées par les analyses sont lues depuis le cache
+df = cache_feather.scanner(fichier, fichier_cache, **config.get("cache", {})).select([
+    "region", "departement", "ville", "nom_officiel_musee",
+    "denomination", "presence_image", "description", "auteur"
+]).collect()
+
+# Colonnes à faible cardinalité encodées en Enum : les regroupements travaillent sur des codes entiers
+df = dictionnaires.encoder(df, config["fichiers"].get("dictionnaire", dictionnaires.FICHIER_DICTIONNAIRE))
 
 print(f"✅ {locale.format_string('%d', len(df), grouping=True)} lignes chargées\n")
 
@@ -71,8 +71,9 @@ print("\n" + "="*80)
 print("🖼️  PRÉSENCE D'IMAGES PAR DÉPARTEMENT")
 print("="*80)
 analyse_images = df.group_by("departement").agg([
-    (pl.col("presence_image") == "oui").sum().alias("avec_image"),
-    (pl.col("presence_image") != "oui").sum().alias("sans_image"),
+    # Enum : comparaison sur le texte, "oui" peut manquer au dictionnaire
+    (pl.col("presence_image").cast(pl.Utf8) == "oui").sum().alias("avec_image"),
+    (pl.col("presence_image").cast(pl.Utf8) != "oui").sum().alias("sans_image"),
     pl.len().alias("total")
 ]).with_columns([
     ((pl.col("avec_image") / pl.col("total")) * 100).round(2).alias("taux_image_%")
@@ -0,0 +1,36 @@
+import maintenance
+import connexion
+import outils
+import logging, yaml
+
+# ============================================================================
+# IMPORTATION RAPIDE - POSTGRESQL
+# 03.07.02.importation.sql exécuté sans index ni contraintes sur joconde_oeuvre :
+# ils sont relevés, supprimés, puis reconstruits en parallèle après le chargement
+# ============================================================================
+with open("config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+table = "joconde_oeuvre"
+fichier_sql = "03.07.02.importation.sql"
+
+engine = connexion.moteur_config(config, profil="staging")
+
+with open(fichier_sql, "r") as f:
+    requete_importation = f.read()
+
+
+def importer():
+    with engine.begin() as conn:
+        conn.exec_driver_sql(requete_importation)
+
+
+outils.chronometre_logging_lambda(
+    "Importation joconde_oeuvre",
+    lambda: maintenance.charger_sans_index(engine, table, importer, **config.get("maintenance", {}))
+)
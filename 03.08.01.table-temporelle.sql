@@ -63,6 +63,10 @@ BEGIN
         NEW.sys_end_time := 'infinity'::TIMESTAMPTZ;
     END IF;
     
+    -- Trigger BEFORE : NEW est NULL pour un DELETE, le renvoyer annulerait la suppression
+    IF (TG_OP = 'DELETE') THEN
+        RETURN OLD;
+    END IF;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1,59 @@
+import polars as pl
+from sqlalchemy import text
+import cache_feather
+import chargement
+import connexion
+import empreintes
+from dotenv import load_dotenv
+import logging
+import yaml
+
+with open("config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+load_dotenv()
+
+fichier = config["fichiers"]["source"]
+fichier_cache = config["fichiers"]["cache"]
+fichier_sql = "03.08.04.merge-delta.sql"
+colonnes = ["reference", "appellation", "auteur", "date_creation", "departement", "description"]
+
+logging.info("📖 Lecture des colonnes comparées (via le cache feather)...")
+lf = cache_feather.scanner(fichier, fichier_cache, **config.get("cache", {}))
+df = empreintes.calculer(empreintes.preparer(lf.select(colonnes)).collect())
+logging.info(f"🔑 {df.height:,} empreintes calculées ({empreintes.VERSION_EMPREINTE})")
+
+engine = connexion.moteur_config(config)
+
+with open(fichier_sql, "r") as f:
+    requete_merge = f.read()
+
+# Delta, merge temporel et empreintes dans une seule transaction :
+# un merge annulé laisse les empreintes publiées intactes et le delta sera recalculé au prochain passage
+with engine.begin() as conn:
+    empreintes.creer_tables(conn)
+    changements = empreintes.detecter(df, empreintes.lire(conn))
+    nb_changements = sum(lignes.height for lignes in changements.values())
+
+    if nb_changements:
+        empreintes.publier_delta(conn, changements, chargement.colonnes_audit(config, horodatage=True))
+        conn.exec_driver_sql(requete_merge)
+        # Une suppression annulée (ex. trigger qui renvoie NEW sur DELETE) garde son empreinte :
+        # la référence sera de nouveau détectée comme supprimée au prochain passage
+        references = changements["D"]["reference"].to_list()
+        restantes = conn.execute(
+            text("SELECT DISTINCT reference FROM joconde_oeuvres_temporelle WHERE reference = ANY(:references)"),
+            {"references": references},
+        ).scalars().all() if references else []
+        if restantes:
+            logging.warning(f"⚠️  {len(restantes)} suppressions sur {len(references)} non appliquées : empreintes conservées")
+            changements["D"] = changements["D"].filter(~pl.col("reference").is_in(restantes))
+        empreintes.enregistrer(conn, changements)
+        logging.info(f"✅ Merge temporel de {nb_changements:,} notices modifiées sur {df.height:,}")
+    else:
+        logging.info("✅ Aucune notice modifiée : merge temporel inutile")
@@ -0,0 +1,61 @@
+-- ============================================================================
+-- MERGE PAR DELTA - POSTGRESQL
+-- staging.joconde_delta ne contient que les notices modifiées depuis le dernier
+-- merge (détectées par empreinte dans 03.08.04.joconde-delta.py) :
+-- le coût du merge dépend du nombre de changements, pas de la taille du catalogue.
+-- L'historisation reste assurée par le trigger trg_archive_joconde.
+-- ============================================================================
+
+-- Suppressions : la version courante part dans l'archive
+DELETE FROM joconde_oeuvres_temporelle t
+USING staging.joconde_delta d
+WHERE d.operation = 'D'
+  AND t.reference = d.reference;
+
+-- Mises à jour (et insertions déjà présentes en base, ex. premier passage sans empreintes) :
+-- la version courante est archivée, sys_start_time repart de maintenant
+UPDATE joconde_oeuvres_temporelle t
+SET
+    appellation = d.appellation,
+    auteur = d.auteur,
+    annee_creation = d.annee_creation,
+    departement = d.departement,
+    description = d.description,
+    date_import_utc = d.load_timestamp_utc,
+    source_system = d.source_system
+FROM staging.joconde_delta d
+WHERE d.operation IN ('U', 'I')
+  AND t.reference = d.reference
+  AND (
+    COALESCE(t.appellation, '') IS DISTINCT FROM COALESCE(d.appellation, '') OR
+    COALESCE(t.auteur, '') IS DISTINCT FROM COALESCE(d.auteur, '') OR
+    COALESCE(t.annee_creation, -1) IS DISTINCT FROM COALESCE(d.annee_creation, -1) OR
+    COALESCE(t.departement, '') IS DISTINCT FROM COALESCE(d.departement, '') OR
+    COALESCE(t.description, '') IS DISTINCT FROM COALESCE(d.description, '')
+  );
+
+-- Insertions : références absentes de la table
+INSERT INTO joconde_oeuvres_temporelle (
+    reference,
+    appellation,
+    auteur,
+    annee_creation,
+    departement,
+    description,
+    date_import_utc,
+    source_system
+)
+SELECT
+    d.reference,
+    d.appellation,
+    d.auteur,
+    d.annee_creation,
+    d.departement,
+    d.description,
+    d.load_timestamp_utc,
+    d.source_system
+FROM staging.joconde_delta d
+WHERE d.operation = 'I'
+  AND NOT EXISTS (
+      SELECT 1 FROM joconde_oeuvres_temporelle t WHERE t.reference = d.reference
+  );
@@ -1,10 +1,14 @@
-from dagster import job, op, get_dagster_logger
+from dagster import job, op
 import polars as pl
+import cache_feather
+import extraction
+import chargement
+import connexion
+import transformations
+from functools import partial
 from dotenv import load_dotenv
-import logging, os
+import logging
 import yaml
-from datetime import datetime, timezone
-from sqlalchemy import MetaData, create_engine, text, insert
 
 with open("config.yaml", "r") as f:
     config = yaml.safe_load(f)
@@ -19,62 +23,31 @@ load_dotenv()
 fichier_cache = config["fichiers"]["cache"]
 
 @op
-def extract_json() -> pl.DataFrame:
+def extract_json() -> str:
+    # Seul le chemin du cache transite entre les ops : chaque processus le projette en mémoire
     fichier = config["fichiers"]["source"]
-    if os.path.exists(fichier_cache):
-        df = pl.read_ipc(fichier_cache)
-    else:
-        df = pl.read_json(fichier, infer_schema_length=None)
-        df.write_ipc(fichier_cache)
-    return df
+    # En cas de cache périmé, le JSON est analysé en parallèle par plages d'octets
+    charger_source = partial(extraction.charger_json_parallele, nb_processus=config.get("extraction", {}).get("processus"))
+    return cache_feather.assurer(fichier, fichier_cache, charger_source=charger_source, **config.get("cache", {}))
 
 @op
-def transform_data(df: pl.DataFrame) -> pl.DataFrame:
-    df_clean = df.with_columns([
-        pl.col("date_creation").str.extract(r"(\d{4})", 1).cast(pl.Int64, strict=False).alias("annee_creation"),
-        pl.col("region").str.to_titlecase().alias("region_normalisee"),
-        pl.when(pl.col("description").str.len_chars() > 200)
-        .then(pl.col("description").str.slice(0, 200) + "...")
-        .otherwise(pl.col("description"))
-        .alias("description_resumee"),
-        pl.col("artiste_sous_droits").is_not_null().alias("artiste_protégé"),
-        pl.lit(datetime.now(timezone.utc).date()).alias("date_import")
-    ])
+def transform_data(chemin_cache: str) -> pl.DataFrame:
+    df_clean = transformations.enrichir(cache_feather.ouvrir(chemin_cache))
     return df_clean
 
 @op
 def load_to_postgresql(df: pl.DataFrame):
-    DB_CONFIG = {
-        'user': 'joconde_import',
-        'password': 'MsacR%GK85.VoykyEU',
-        'host': 'localhost',
-        'port': '5434',
-        'database': 'joconde_staging',
-        'schema': 'staging'
-    }
-    
-    engine = create_engine(
-        f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-        f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}",
-        executemany_mode='values_plus_batch'
+    # Engine partagé du processus (profil staging) : pool et connexion créés une seule fois
+    engine = connexion.moteur_config(config, profil="staging")
+    # Table fantôme remplie (COPY), indexée et analysée, puis substituée par renommage :
+    # les lecteurs de la table ne sont bloqués que le temps de la bascule.
+    # Colonnes d'audit ajoutées par tranche ; load_timestamp_utc fixé une fois pour tout le chargement
+    # (la table de staging PostgreSQL n'a pas de valeur par défaut pour cette colonne)
+    chargement.charger_par_bascule(
+        engine, df, config["staging"]["table"],
+        nb_connexions=config.get("chargement", {}).get("connexions", 1),
+        constantes=chargement.colonnes_audit(config, horodatage=True),
     )
-    
-    metadata = MetaData(schema=DB_CONFIG['schema'])
-    metadata.reflect(bind=engine)
-    joconde_table = metadata.tables[config["staging"]["table"]]
-    
-    records = [
-        {
-            **row,
-            "source_system": config["audit"]["source_system"],
-            "load_process": config["audit"]["load_process"]
-        }
-        for row in df.to_dicts()
-    ]
-    
-    with engine.begin() as conn:
-        conn.execute(text(f"TRUNCATE TABLE {config['staging']['table']};"))
-        conn.execute(insert(joconde_table), records)
 
 @job
 def etl_flow():
@@ -1,10 +1,15 @@
 from prefect import flow, task
+from prefect.blocks.core import Block
 import polars as pl
+import cache_feather
+import extraction
+import chargement
+import connexion
+import transformations
+from functools import partial
 from dotenv import load_dotenv
-import logging, os
+import logging
 import yaml
-from datetime import datetime, timezone
-from sqlalchemy import MetaData, create_engine, text, insert
 
 with open("config.yaml", "r") as f:
     config = yaml.safe_load(f)
@@ -18,68 +23,59 @@ load_dotenv()
 
 fichier_cache = config["fichiers"]["cache"]
 
+
+class PostgresJoconde(Block):
+    """Accès PostgreSQL partagé par les tâches : un pool par processus (pendant du PostgresResource Dagster)"""
+
+    profil: str = "staging"
+    taille_pool: int = 5
+    debordement: int = 10
+    pre_ping: bool = True
+    recyclage: int = 1800
+    cache_requetes: int = 500
+
+    def moteur(self):
+        # connexion.moteur est mis en cache : chaque exécution du processus réutilise le même pool
+        return connexion.moteur(
+            self.profil,
+            taille_pool=self.taille_pool,
+            debordement=self.debordement,
+            pre_ping=self.pre_ping,
+            recyclage=self.recyclage,
+            cache_requetes=self.cache_requetes,
+        )
+
+
 @task
 def extract_json(fichier: str) -> pl.DataFrame:
-    if os.path.exists(fichier_cache):
-        df = pl.read_ipc(fichier_cache)
-    else:
-        df = pl.read_json(fichier, infer_schema_length=None)
-        df.write_ipc(fichier_cache)
-    return df
+    # En cas de cache périmé, le JSON est analysé en parallèle par plages d'octets
+    charger_source = partial(extraction.charger_json_parallele, nb_processus=config.get("extraction", {}).get("processus"))
+    return cache_feather.charger(fichier, fichier_cache, charger_source=charger_source, **config.get("cache", {}))
 
 @task
 def transform_data(df: pl.DataFrame) -> pl.DataFrame:
-    df_clean = df.with_columns([
-        pl.col("date_creation").str.extract(r"(\d{4})", 1).cast(pl.Int64, strict=False).alias("annee_creation"),
-        pl.col("region").str.to_titlecase().alias("region_normalisee"),
-        pl.when(pl.col("description").str.len_chars() > 200)
-        .then(pl.col("description").str.slice(0, 200) + "...")
-        .otherwise(pl.col("description"))
-        .alias("description_resumee"),
-        pl.col("artiste_sous_droits").is_not_null().alias("artiste_protégé"),
-        pl.lit(datetime.now(timezone.utc).date()).alias("date_import")
-    ])
+    df_clean = transformations.enrichir(df)
     return df_clean
 
 @task
-def load_to_postgresql(df: pl.DataFrame):
-    DB_CONFIG = {
-        'user': 'joconde_import',
-        'password': 'MsacR%GK85.VoykyEU',
-        'host': 'localhost',
-        'port': '5434',
-        'database': 'joconde_staging',
-        'schema': 'staging'
-    }
-    
-    engine = create_engine(
-        f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-        f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}",
-        executemany_mode='values_plus_batch'
+def load_to_postgresql(df: pl.DataFrame, postgres: PostgresJoconde):
+    engine = postgres.moteur()
+    # Table fantôme remplie (COPY), indexée et analysée, puis substituée par renommage :
+    # les lecteurs de la table ne sont bloqués que le temps de la bascule.
+    # Colonnes d'audit ajoutées par tranche ; load_timestamp_utc fixé une fois pour tout le chargement
+    # (la table de staging PostgreSQL n'a pas de valeur par défaut pour cette colonne)
+    chargement.charger_par_bascule(
+        engine, df, config["staging"]["table"],
+        nb_connexions=config.get("chargement", {}).get("connexions", 1),
+        constantes=chargement.colonnes_audit(config, horodatage=True),
     )
-    
-    metadata = MetaData(schema=DB_CONFIG['schema'])
-    metadata.reflect(bind=engine)
-    joconde_table = metadata.tables[config["staging"]["table"]]
-    
-    records = [
-        {
-            **row,
-            "source_system": config["audit"]["source_system"],
-            "load_process": config["audit"]["load_process"]
-        }
-        for row in df.to_dicts()
-    ]
-    
-    with engine.begin() as conn:
-        conn.execute(text(f"TRUNCATE TABLE {config['staging']['table']};"))
-        conn.execute(insert(joconde_table), records)
 
 @flow
 def etl_flow(fichier_source: str):
     df_raw = extract_json(fichier_source)
     df_clean = transform_data(df_raw)
-    load_to_postgresql(df_clean)
+    # Réglages du pool : section `postgres` de config.yaml, comme la ressource Dagster
+    load_to_postgresql(df_clean, PostgresJoconde(profil="staging", **config.get("postgres", {})))
 
 if __name__ == "__main__":
     fichier_source = config["fichiers"]["source"]
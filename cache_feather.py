@@ -0,0 +1,124 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+import polars as pl
+import extraction
+import schema_joconde
+
+# À incrémenter quand le contenu mis en cache change de forme (nouvelle transformation...)
+VERSION_TRANSFORMATION = "1"
+TAILLE_MAX_MO = 4096
+# Sans compression, les tampons Arrow du fichier sont directement projetables en mémoire (zéro copie)
+COMPRESSION_IPC = "uncompressed"
+
+_statistiques = {"hits": 0, "misses": 0, "ecritures": 0, "evictions": 0}
+
+
+def empreinte_source(path, hash_contenu=False):
+    """Empreinte du fichier source : taille, date de modification et, en option, SHA-256 du contenu"""
+    stat = os.stat(path)
+    empreinte = {"taille": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if hash_contenu:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for bloc in iter(lambda: f.read(1 << 20), b""):
+                sha.update(bloc)
+        empreinte["sha256"] = sha.hexdigest()
+    return empreinte
+
+
+def chemin_entree(source, fichier_cache, version_transformation=VERSION_TRANSFORMATION, hash_contenu=False):
+    """Chemin de l'entrée de cache correspondant à l'état actuel de la source"""
+    cle = json.dumps([
+        os.path.abspath(source),
+        empreinte_source(source, hash_contenu),
+        schema_joconde.SCHEMA_VERSION,
+        version_transformation,
+    ], sort_keys=True)
+    base, extension = os.path.splitext(fichier_cache)
+    return f"{base}-{hashlib.sha1(cle.encode()).hexdigest()[:16]}{extension or '.feather'}"
+
+
+def ecrire_atomique(df, chemin):
+    """Écrit le cache dans un fichier temporaire puis le renomme : jamais de cache à moitié écrit"""
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    try:
+        df.write_ipc(temporaire, compression=COMPRESSION_IPC)
+        with open(temporaire, "rb+") as f:
+            os.fsync(f.fileno())
+        os.chmod(temporaire, 0o444)  # une entrée publiée n'est plus jamais modifiée
+        os.replace(temporaire, chemin)
+    finally:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+    _statistiques["ecritures"] += 1
+
+
+def evincer(fichier_cache, taille_max_mo=TAILLE_MAX_MO, garder=None):
+    """Supprime les entrées les moins récemment utilisées au-delà du budget (et les temporaires orphelins)"""
+    base, extension = os.path.splitext(fichier_cache)
+    for orphelin in glob.glob(f"{glob.escape(base)}-*.tmp"):
+        if time.time() - os.path.getmtime(orphelin) > 3600:
+            os.remove(orphelin)
+
+    entrees = sorted(
+        glob.glob(f"{glob.escape(base)}-*{extension or '.feather'}"),
+        key=os.path.getatime,
+    )
+    total = sum(os.path.getsize(e) for e in entrees)
+    for entree in entrees:
+        if total <= taille_max_mo * 1024**2:
+            break
+        if entree == garder:
+            continue
+        total -= os.path.getsize(entree)
+        os.remove(entree)
+        _statistiques["evictions"] += 1
+        logging.info(f"🧹 Cache évincé : {entree}")
+
+
+def assurer(source, fichier_cache, charger_source=extraction.charger,
+            version_transformation=VERSION_TRANSFORMATION, hash_contenu=False, taille_max_mo=TAILLE_MAX_MO):
+    """Garantit qu'une entrée de cache à jour existe pour la source et retourne son chemin"""
+    chemin = chemin_entree(source, fichier_cache, version_transformation, hash_contenu)
+    if os.path.exists(chemin):
+        _statistiques["hits"] += 1
+        try:
+            os.utime(chemin)  # marque l'entrée comme récemment utilisée pour l'éviction
+        except PermissionError:
+            pass  # entrée créée par un autre utilisateur : lecture seule
+        logging.info(f"📦 Cache feather à jour ({os.path.getsize(chemin) / (1024**2):.2f} Mo) - {statistiques()}")
+        return chemin
+
+    _statistiques["misses"] += 1
+    logging.info(f"📥 Cache absent ou périmé, chargement depuis la source {source}")
+    os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+    ecrire_atomique(charger_source(source), chemin)
+    logging.info(f"💾 Cache feather créé : {os.path.getsize(chemin) / (1024**2):.2f} Mo - {statistiques()}")
+    evincer(fichier_cache, taille_max_mo, garder=chemin)
+    return chemin
+
+
+def ouvrir(chemin, colonnes=None):
+    """Projette une entrée de cache en mémoire, en lecture seule et sans copie"""
+    # Pas de rechunk : les processus qui ouvrent la même entrée partagent le cache de pages
+    # du système au lieu de garder chacun une copie privée des données
+    return pl.read_ipc(chemin, columns=colonnes, memory_map=True, rechunk=False)
+
+
+def charger(source, fichier_cache, colonnes=None, **options):
+    """Charge la source via le cache feather (recréé automatiquement si la source a changé)"""
+    return ouvrir(assurer(source, fichier_cache, **options), colonnes)
+
+
+def scanner(source, fichier_cache, **options):
+    """Scan paresseux du cache : seules les colonnes et lignes demandées sont lues sur le disque"""
+    return pl.scan_ipc(assurer(source, fichier_cache, **options), memory_map=True, rechunk=False)
+
+
+def statistiques():
+    """Compteurs hits/misses/écritures/évictions du processus courant"""
+    return dict(_statistiques)
@@ -0,0 +1,474 @@
+import hashlib
+import io
+import logging
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import polars as pl
+import pyarrow as pa
+from sqlalchemy import MetaData, Table, insert, text
+from sqlalchemy.exc import OperationalError
+
+NB_CONNEXIONS = 4    # connexions utilisées par charger_par_bascule
+
+# Envois COPY dimensionnés en octets (les descriptions vont de vide à plusieurs Ko) :
+# le budget part de BUDGET_OCTETS et suit le meilleur débit mesuré, sans dépasser PLAFOND_OCTETS
+BUDGET_OCTETS = 16 * 1024**2
+BUDGET_MIN_OCTETS = 1024**2
+PLAFOND_OCTETS = 128 * 1024**2  # plafond mémoire d'un envoi (tranche préparée + tampon CSV)
+PAS_BUDGET = 1.5                # facteur appliqué au budget à chaque ajustement
+
+
+def _nom_qualifie(table):
+    """("staging", "joconde") à partir de "staging.joconde" (schéma public par défaut)"""
+    schema, _, nom = table.rpartition(".")
+    return schema or "public", nom
+
+
+def colonnes_table(conn, table):
+    """Colonnes de la table cible, dans l'ordre de la table (tables temporaires comprises)"""
+    return list(conn.execute(text(f"SELECT * FROM {table} LIMIT 0")).keys())
+
+
+def _tableau_postgresql(colonne):
+    """Liste Polars -> littéral de tableau PostgreSQL {"a","b"} (le CSV ne sait pas écrire les listes)"""
+    element = (
+        pl.when(pl.element().is_null())
+        .then(pl.lit("NULL"))
+        .otherwise('"' + pl.element().cast(pl.Utf8).str.replace_all("\\", "\\\\", literal=True).str.replace_all('"', '\\"', literal=True) + '"')
+    )
+    return ("{" + pl.col(colonne).list.eval(element).list.join(",") + "}").alias(colonne)
+
+
+def preparer(df):
+    """Types compatibles avec le format CSV de COPY : texte, nombres, booléens, dates ISO 8601"""
+    expressions = []
+    for nom, dtype in df.schema.items():
+        if isinstance(dtype, pl.List):
+            expressions.append(_tableau_postgresql(nom))
+        elif dtype == pl.Categorical or isinstance(dtype, pl.Enum):
+            expressions.append(pl.col(nom).cast(pl.Utf8))
+        elif isinstance(dtype, pl.Datetime) and dtype.time_zone is None:
+            # Horodatages naïfs : UTC, comme partout dans le projet (datetime.now(timezone.utc))
+            expressions.append(pl.col(nom).dt.replace_time_zone("UTC"))
+        else:
+            expressions.append(pl.col(nom))
+    return df.select(expressions)
+
+
+def encoder_csv(df):
+    """Lot -> tampon CSV pour COPY : NULL = champ vide non quoté, chaîne vide = "" """
+    tampon = io.BytesIO()
+    preparer(df).write_csv(tampon, include_header=False, null_value="", quote_style="non_numeric")
+    tampon.seek(0)
+    return tampon
+
+
+def tailles_lignes(df):
+    """Taille approximative de chaque ligne une fois encodée en CSV (octets)"""
+    tailles = []
+    for nom, dtype in df.schema.items():
+        if dtype == pl.Utf8 or dtype == pl.Categorical or isinstance(dtype, pl.Enum):
+            # + guillemets et séparateur
+            tailles.append(pl.col(nom).cast(pl.Utf8).str.len_bytes().fill_null(0).cast(pl.Int64) + 3)
+        elif isinstance(dtype, pl.List):
+            tailles.append(pl.col(nom).list.len().fill_null(0).cast(pl.Int64) * 16 + 3)
+        else:
+            tailles.append(pl.lit(12, dtype=pl.Int64))  # nombres, booléens, dates
+    return df.select(pl.sum_horizontal(tailles).alias("octets")).to_series()
+
+
+class Ajusteur:
+    """Budget en octets des envois COPY, ajusté pas à pas vers le meilleur débit mesuré"""
+
+    def __init__(self, budget=BUDGET_OCTETS, minimum=BUDGET_MIN_OCTETS, plafond=PLAFOND_OCTETS, pas=PAS_BUDGET):
+        self.budget = min(plafond, max(minimum, budget))
+        self.minimum, self.plafond, self.pas = minimum, plafond, pas
+        self.sens = 1               # +1 : on grossit les envois, -1 : on les réduit
+        self.debit_precedent = None
+        self.mesures = []
+
+    def mesurer(self, lignes, octets, duree):
+        """Enregistre un envoi (encodage + COPY) et ajuste le budget du suivant"""
+        duree = max(duree, 1e-6)
+        mesure = {
+            "budget_mo": self.budget / 1024**2,
+            "lignes": lignes,
+            "mo": octets / 1024**2,
+            "secondes": duree,
+            "lignes_s": lignes / duree,
+            "mo_s": octets / 1024**2 / duree,
+        }
+        self.mesures.append(mesure)
+        # Un envoi de fin de lot, bien plus petit que le budget, ne dit rien du budget : pas d'ajustement
+        if octets >= self.budget / 2:
+            # Montée de gradient : on continue dans le même sens tant que le débit progresse
+            if self.debit_precedent is not None and mesure["mo_s"] < self.debit_precedent:
+                self.sens = -self.sens
+            self.debit_precedent = mesure["mo_s"]
+            self.budget = int(min(self.plafond, max(self.minimum, self.budget * self.pas ** self.sens)))
+        logging.info(
+            f"📏 Envoi de {lignes} lignes ({mesure['mo']:.1f} Mo) en {duree:.2f} s : "
+            f"{mesure['lignes_s']:,.0f} lignes/s, {mesure['mo_s']:.1f} Mo/s -> budget {self.budget / 1024**2:.1f} Mo"
+        )
+
+    def bilan(self, table, depuis=0):
+        """Résumé des envois (à partir de l'envoi `depuis`) : débit global et meilleur budget"""
+        mesures = self.mesures[depuis:]
+        if not mesures:
+            return None
+        secondes = sum(m["secondes"] for m in mesures)
+        meilleur = max(mesures, key=lambda m: m["mo_s"])
+        resume = {
+            "envois": len(mesures),
+            "lignes_s": sum(m["lignes"] for m in mesures) / secondes,
+            "mo_s": sum(m["mo"] for m in mesures) / secondes,
+            "meilleur_budget_mo": meilleur["budget_mo"],
+            "budget_final_mo": self.budget / 1024**2,
+        }
+        logging.info(
+            f"📊 {table} : {resume['envois']} envois, {resume['lignes_s']:,.0f} lignes/s, {resume['mo_s']:.1f} Mo/s ; "
+            f"meilleur budget {resume['meilleur_budget_mo']:.1f} Mo, budget final {resume['budget_final_mo']:.1f} Mo"
+        )
+        return resume
+
+
+def colonnes_audit(config, horodatage=False):
+    """Valeurs d'audit constantes d'un chargement (section `audit` de config.yaml)"""
+    constantes = {
+        "source_system": config["audit"]["source_system"],
+        "load_process": config["audit"]["load_process"],
+    }
+    if horodatage:
+        # Sinon, la valeur par défaut de la colonne côté serveur s'applique
+        constantes["load_timestamp_utc"] = datetime.now(timezone.utc)
+    return constantes
+
+
+def _en_lots(lots):
+    """DataFrame, table/lot Arrow ou suite de ceux-ci -> suite de DataFrame Polars (sans copie)"""
+    if isinstance(lots, (pl.DataFrame, pa.Table, pa.RecordBatch)):
+        lots = [lots]
+    for lot in lots:
+        if isinstance(lot, pa.RecordBatch):
+            lot = pa.Table.from_batches([lot])
+        yield lot if isinstance(lot, pl.DataFrame) else pl.from_arrow(lot, rechunk=False)
+
+
+def copier(conn, lots, table, constantes=None, ajusteur=None):
+    """Charge un DataFrame (ou une suite de lots) dans `table` par COPY ... FROM STDIN, dans la transaction de `conn`"""
+    constantes = constantes or {}
+    # Un ajusteur partagé entre plusieurs appels garde le budget appris (ex. fichiers successifs du watcher)
+    ajusteur = ajusteur or Ajusteur()
+    depuis = len(ajusteur.mesures)
+    cibles = colonnes_table(conn, table)
+    curseur = conn.connection.driver_connection.cursor()
+    total = 0
+    try:
+        for lot in _en_lots(lots):
+            # Seules les colonnes présentes dans la table cible sont envoyées
+            colonnes = [c for c in lot.columns if c in cibles and c not in constantes]
+            audit = {nom: valeur for nom, valeur in constantes.items() if nom in cibles}
+            liste_colonnes = ", ".join(f'"{c}"' for c in colonnes + list(audit))
+            commande = f"COPY {table} ({liste_colonnes}) FROM STDIN WITH (FORMAT csv, NULL '')"
+            # Tailles cumulées des lignes : chaque envoi s'arrête à la ligne qui dépasse le budget
+            cumul = tailles_lignes(lot.select(colonnes)).cum_sum()
+            offset = 0
+            while offset < lot.height:
+                deja = cumul[offset - 1] if offset else 0
+                fin = max(offset + 1, cumul.search_sorted(deja + ajusteur.budget, side="right"))
+                debut = time.perf_counter()
+                # Tranche sans copie ; les constantes d'audit n'existent que le temps de l'encodage de la tranche
+                morceau = lot.slice(offset, fin - offset).select(colonnes).with_columns(
+                    [pl.lit(valeur).alias(nom) for nom, valeur in audit.items()]
+                )
+                tampon = encoder_csv(morceau)
+                curseur.copy_expert(commande, tampon)
+                ajusteur.mesurer(morceau.height, tampon.getbuffer().nbytes, time.perf_counter() - debut)
+                total += morceau.height
+                offset = fin
+            logging.info(f"📤 {total} enregistrements copiés dans {table}")
+    finally:
+        curseur.close()
+    ajusteur.bilan(table, depuis)
+    return total
+
+
+def fusionner(conn, df, table, cle="reference", constantes=None):
+    """Upsert de `df` dans `table` sur `cle` : COPY dans une table temporaire puis remplacement des lignes"""
+    temporaire = f"fusion_{_nom_qualifie(table)[1]}"
+    conn.execute(text(f"CREATE TEMP TABLE {temporaire} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"))
+    # Une seule version par clé : la dernière du lot
+    total = copier(conn, df.unique(subset=cle, keep="last", maintain_order=True), temporaire, constantes)
+    colonnes = ", ".join(f'"{c}"' for c in colonnes_table(conn, temporaire))
+    # DELETE + INSERT plutôt que ON CONFLICT : les tables cibles n'ont pas toujours de contrainte unique sur la clé
+    conn.execute(text(f'DELETE FROM {table} t USING {temporaire} f WHERE t."{cle}" = f."{cle}"'))
+    conn.execute(text(f"INSERT INTO {table} ({colonnes}) SELECT {colonnes} FROM {temporaire}"))
+    conn.execute(text(f"DROP TABLE {temporaire}"))
+    logging.info(f"🔀 {total} lignes fusionnées dans {table}")
+    return total
+
+
+def _copier_tranches(engine, df, table, nb_connexions, constantes=None):
+    """Copie `df` en `nb_connexions` tranches, chacune sur sa connexion et dans sa transaction"""
+    def copier_tranche(tranche):
+        with engine.begin() as conn:
+            return copier(conn, tranche, table, constantes)
+
+    # Tranches contiguës sans copie ; psycopg2 et Polars relâchent le GIL pendant le COPY et l'encodage
+    taille_tranche = -(-df.height // nb_connexions) or 1
+    tranches = [df.slice(offset, taille_tranche) for offset in range(0, df.height, taille_tranche)]
+    with ThreadPoolExecutor(max_workers=nb_connexions) as pool:
+        total = sum(pool.map(copier_tranche, tranches))
+    logging.info(f"⚡ {total} lignes copiées sur {len(tranches)} connexions dans {table}")
+    return total
+
+
+def _nom_provisoire(nom, suffixe):
+    """`nom`_`suffixe` dans la limite de 63 octets des identifiants PostgreSQL (au-delà, il serait tronqué)"""
+    provisoire = f"{nom}_{suffixe}"
+    if len(provisoire.encode("utf-8")) <= 63:
+        return provisoire
+    # Préfixe tronqué + empreinte du nom complet : deux noms longs de même début restent distincts
+    marque = f"_{hashlib.md5(nom.encode('utf-8')).hexdigest()[:8]}_{suffixe}"
+    prefixe = nom.encode("utf-8")[:63 - len(marque.encode("utf-8"))].decode("utf-8", errors="ignore")
+    return prefixe + marque
+
+
+def _role(conn, role):
+    """Bénéficiaire d'un GRANT : PUBLIC est un mot-clé, les autres rôles des identifiants"""
+    return "PUBLIC" if role == "PUBLIC" else conn.dialect.identifier_preparer.quote(role)
+
+
+_DEFINITION_INDEX = re.compile(
+    r'(?P<debut>CREATE (?:UNIQUE )?INDEX) (?:"(?:[^"]|"")*"|\S+) ON (?:ONLY )?'
+    r'(?:(?:"(?:[^"]|"")*"|[^\s."]+)\.)?(?:"(?:[^"]|"")*"|[^\s."]+) (?P<suite>USING .*)',
+    re.DOTALL,
+)
+
+# pg_trigger.tgenabled autre que "O" (actif) : état à rétablir après CREATE TRIGGER
+_ETATS_TRIGGER = {"D": "DISABLE", "R": "ENABLE REPLICA", "A": "ENABLE ALWAYS"}
+
+
+def _index_ombre(definition, nom_index, table):
+    """Définition pg_get_indexdef réécrite pour créer l'index `nom_index` sur `table`"""
+    # CREATE [UNIQUE] INDEX nom ON [ONLY] schéma.table USING méthode (...) : noms éventuellement entre guillemets
+    m = _DEFINITION_INDEX.fullmatch(definition)
+    if not m:
+        # Plutôt que de risquer de construire l'index sur la table en service
+        raise ValueError(f"Définition d'index non reconnue : {definition}")
+    return f'{m["debut"]} "{nom_index}" ON {table} {m["suite"]}'
+
+
+def _objets_dependants(conn, table):
+    """Index, contraintes, triggers, vues, droits et séquences de `table` à reproduire sur la table fantôme"""
+    schema, nom = _nom_qualifie(table)
+    parametres = {"table": f"{schema}.{nom}"}
+    return {
+        # Index qui ne portent pas une contrainte (ceux-là sont recréés avec la contrainte)
+        "index": conn.execute(text("""
+            SELECT c.relname, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = CAST(:table AS regclass)
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+        """), parametres).all(),
+        "contraintes": conn.execute(text("""
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = CAST(:table AS regclass) AND contype IN ('p', 'u', 'x')
+        """), parametres).all(),
+        # Clés étrangères sortantes (vers d'autres tables)
+        "cles_etrangeres": conn.execute(text("""
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'
+              AND confrelid <> CAST(:table AS regclass)
+        """), parametres).all(),
+        # Clés étrangères qui référencent la table (la sienne comprise) : elles suivraient l'ancienne table
+        "references": conn.execute(text("""
+            SELECT format('%s.%I', CAST(conrelid AS regclass), conname)
+            FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = CAST(:table AS regclass)
+        """), parametres).all(),
+        # Vues qui lisent directement la table (elles suivraient l'ancienne table après le renommage)
+        "vues": conn.execute(text("""
+            SELECT DISTINCT format('%I.%I', n.nspname, v.relname), pg_get_viewdef(v.oid)
+            FROM pg_depend d
+            JOIN pg_rewrite r ON r.oid = d.objid
+            JOIN pg_class v ON v.oid = r.ev_class AND v.relkind = 'v'
+            JOIN pg_namespace n ON n.oid = v.relnamespace
+            WHERE d.refobjid = CAST(:table AS regclass) AND v.oid <> d.refobjid
+        """), parametres).all(),
+        "droits": conn.execute(text("""
+            SELECT privilege_type, grantee FROM information_schema.role_table_grants
+            WHERE table_schema = :schema AND table_name = :nom AND grantee <> current_user
+        """), {"schema": schema, "nom": nom}).all(),
+        # Triggers utilisateur (historisation, audit...) : ils partiraient avec l'ancienne table
+        "triggers": conn.execute(text("""
+            SELECT tgname, pg_get_triggerdef(oid), tgenabled
+            FROM pg_trigger
+            WHERE tgrelid = CAST(:table AS regclass) AND NOT tgisinternal
+        """), parametres).all(),
+        # Colonnes identité : la table fantôme a ses propres séquences, à recaler sur celles de `table`
+        "identites": conn.execute(text("""
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = CAST(:table AS regclass) AND attidentity <> '' AND NOT attisdropped
+        """), parametres).scalars().all(),
+        # Séquences possédées par une colonne : supprimées avec l'ancienne table si on ne les rattache pas
+        "sequences": conn.execute(text("""
+            SELECT CAST(s.oid AS regclass)::text, a.attname
+            FROM pg_depend d
+            JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+            JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+            WHERE d.refobjid = CAST(:table AS regclass) AND d.deptype = 'a'
+        """), parametres).all(),
+    }
+
+
+def charger_par_bascule(engine, df, table, nb_connexions=1, constantes=None, lock_timeout="50ms", nb_essais=30):
+    """Remplit une table fantôme, l'indexe, l'analyse puis la substitue à `table` par renommage"""
+    schema, nom = _nom_qualifie(table)
+    ombre, ancienne = _nom_provisoire(nom, "ombre"), _nom_provisoire(nom, "ancienne")
+    with engine.begin() as conn:
+        objets = _objets_dependants(conn, table)
+        if objets["references"]:
+            # Après le renommage, elles pointeraient vers l'ancienne table et en empêcheraient la suppression
+            raise RuntimeError(
+                f"{table} est référencée par des clés étrangères {[r[0] for r in objets['references']]} : "
+                f"bascule impossible, charger la table en place"
+            )
+        conn.execute(text(f"DROP TABLE IF EXISTS {schema}.{ombre}"))
+        # Sans index : ils sont construits une seule fois, après la copie
+        conn.execute(text(
+            f"CREATE TABLE {schema}.{ombre} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY)"
+        ))
+
+    try:
+        # Chargement et indexation de la table fantôme : `table` reste lisible pendant tout ce temps
+        if nb_connexions > 1:
+            total = _copier_tranches(engine, df, f"{schema}.{ombre}", nb_connexions, constantes)
+        else:
+            with engine.begin() as conn:
+                total = copier(conn, df, f"{schema}.{ombre}", constantes)
+
+        # Définitions issues du catalogue exécutées telles quelles (exec_driver_sql : pas d'analyse des ":" ni des "%")
+        with engine.begin() as conn:
+            for nom_contrainte, definition in objets["contraintes"]:
+                conn.exec_driver_sql(
+                    f'ALTER TABLE {schema}.{ombre} ADD CONSTRAINT "{_nom_provisoire(nom_contrainte, "ombre")}" {definition}'
+                )
+            for nom_index, definition in objets["index"]:
+                conn.exec_driver_sql(_index_ombre(definition, _nom_provisoire(nom_index, "ombre"), f"{schema}.{ombre}"))
+            # Clés étrangères : ajoutées NOT VALID puis validées en un seul balayage, avant la bascule
+            for nom_contrainte, definition in objets["cles_etrangeres"]:
+                provisoire = _nom_provisoire(nom_contrainte, "ombre")
+                conn.exec_driver_sql(
+                    f'ALTER TABLE {schema}.{ombre} ADD CONSTRAINT "{provisoire}" {definition.replace(" NOT VALID", "")} NOT VALID'
+                )
+                conn.execute(text(f'ALTER TABLE {schema}.{ombre} VALIDATE CONSTRAINT "{provisoire}"'))
+            for privilege, role in objets["droits"]:
+                conn.execute(text(f"GRANT {privilege} ON {schema}.{ombre} TO {_role(conn, role)}"))
+            conn.execute(text(f"ANALYZE {schema}.{ombre}"))
+
+        # Bascule : quelques millisecondes de verrou exclusif. Les lecteurs se mettent en file derrière une demande
+        # de verrou en attente : elle est abandonnée après `lock_timeout` et retentée un peu plus tard
+        for essai in range(1, nb_essais + 1):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+                    conn.execute(text(f"ALTER TABLE {table} RENAME TO {ancienne}"))
+                    conn.execute(text(f"ALTER TABLE {schema}.{ombre} RENAME TO {nom}"))
+                    # Les vues suivent l'ancienne table : on les rattache à la nouvelle (droits conservés)
+                    for vue, definition in objets["vues"]:
+                        conn.exec_driver_sql(f"CREATE OR REPLACE VIEW {vue} AS {definition}")
+                    for sequence, colonne in objets["sequences"]:
+                        conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {table}."{colonne}"'))
+                    # Identités : la nouvelle séquence reprend au-delà de l'ancienne et des valeurs copiées
+                    for colonne in objets["identites"]:
+                        conn.execute(text(f"""
+                            SELECT setval(pg_get_serial_sequence(:nouvelle, :colonne), GREATEST(
+                                COALESCE(pg_sequence_last_value(CAST(pg_get_serial_sequence(:ancienne, :colonne) AS regclass)), 0),
+                                COALESCE((SELECT MAX("{colonne}") FROM {table}), 0),
+                                1
+                            ))
+                        """), {"nouvelle": table, "ancienne": f"{schema}.{ancienne}", "colonne": colonne})
+                    conn.execute(text(f"DROP TABLE {schema}.{ancienne}"))
+                    # Triggers recréés sur la nouvelle table une fois l'ancienne supprimée (mêmes noms, même état) :
+                    # ils ne se déclenchent pas pendant le remplissage de la table fantôme
+                    for nom_trigger, definition, etat in objets["triggers"]:
+                        conn.exec_driver_sql(definition)
+                        if etat in _ETATS_TRIGGER:
+                            conn.execute(text(f'ALTER TABLE {table} {_ETATS_TRIGGER[etat]} TRIGGER "{nom_trigger}"'))
+                    for nom_contrainte, _ in objets["contraintes"] + objets["cles_etrangeres"]:
+                        conn.execute(text(
+                            f'ALTER TABLE {table} RENAME CONSTRAINT "{_nom_provisoire(nom_contrainte, "ombre")}" TO "{nom_contrainte}"'
+                        ))
+                    for nom_index, _ in objets["index"]:
+                        conn.execute(text(f'ALTER INDEX {schema}."{_nom_provisoire(nom_index, "ombre")}" RENAME TO "{nom_index}"'))
+                break
+            except OperationalError as e:
+                if "lock timeout" not in str(e) or essai == nb_essais:
+                    raise
+                logging.warning(f"🔒 Bascule de {table} : verrou non obtenu (essai {essai}/{nb_essais})")
+                # Attente croissante (plafonnée à 2 s) et aléatoire : pas de retour en phase avec les transactions longues
+                time.sleep(min(2.0, 0.05 * 2**essai) * random.uniform(0.5, 1.5))
+    except Exception:
+        # Échec : la table en service n'a pas été modifiée
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {schema}.{ombre}"))
+        raise
+    logging.info(f"🔁 {total} lignes publiées dans {table} par bascule de table fantôme")
+    return total
+
+
+def benchmark(engine, df, table, connexions=(1, 2, 4, 8)):
+    """Compare insert(table) + to_dicts(), COPY et bascule parallèle sur des tables de test identiques à `table`"""
+    temporaire = f"bench_{_nom_qualifie(table)[1]}"
+    resultats = {}
+    for nom in ("insert + to_dicts", "COPY FROM STDIN"):
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE TEMP TABLE {temporaire} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"))
+            debut = time.perf_counter()
+            if nom == "COPY FROM STDIN":
+                copier(conn, df, temporaire)
+            else:
+                cible = Table(temporaire, MetaData(), autoload_with=conn)
+                colonnes = [c for c in df.columns if c in cible.columns]
+                conn.execute(insert(cible), df.select(colonnes).to_dicts())
+            resultats[nom] = time.perf_counter() - debut
+            print(f"⏱ {nom:20} : {resultats[nom]:8.2f} sec ({df.height / resultats[nom]:,.0f} lignes/s)")
+
+    # Le chargement parallèle a besoin d'une vraie table, visible de toutes les connexions
+    schema, nom_table = _nom_qualifie(table)
+    test = f"{schema}.bench_{nom_table}"
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {test}"))
+        conn.execute(text(f"CREATE TABLE {test} (LIKE {table} INCLUDING DEFAULTS)"))
+    try:
+        for nb in connexions:
+            nom = f"bascule parallèle x{nb}"
+            debut = time.perf_counter()
+            charger_par_bascule(engine, df, test, nb_connexions=nb)
+            resultats[nom] = time.perf_counter() - debut
+            print(f"⏱ {nom:20} : {resultats[nom]:8.2f} sec ({df.height / resultats[nom]:,.0f} lignes/s)")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {test}"))
+    return resultats
+
+
+if __name__ == "__main__":
+    import yaml
+    import cache_feather
+    import connexion
+
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    engine = connexion.moteur_config(config)
+    df = cache_feather.charger(config["fichiers"]["source"], config["fichiers"]["cache"], **config.get("cache", {}))
+    benchmark(engine, df, config["staging"]["table"])
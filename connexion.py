@@ -0,0 +1,107 @@
+import logging
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL
+from sqlalchemy.pool import NullPool
+
+load_dotenv()
+load_dotenv(".env_staging")  # variables POSTGRES_STAGING_* du profil "staging"
+
+# Bases utilisées par les scripts : valeurs par défaut, surchargées par les variables d'environnement
+# (POSTGRES_USER, POSTGRES_DB... pour "joconde" ; POSTGRES_STAGING_USER, POSTGRES_STAGING_DB... pour "staging").
+# None : pas de valeur par défaut, la variable doit être définie (mot de passe de staging)
+PROFILS = {
+    "joconde": {
+        "prefixe": "POSTGRES_",
+        "user": "airflow",
+        "password": "airflow",
+        "host": "localhost",
+        "port": "5434",
+        "db": "joconde",
+    },
+    "staging": {
+        "prefixe": "POSTGRES_STAGING_",
+        "user": "joconde_import",
+        "password": None,
+        "host": "localhost",
+        "port": "5434",
+        "db": "joconde_staging",
+    },
+}
+BASE_ADMIN = "airflow"  # base de maintenance utilisée pour créer les bases manquantes
+
+# Réglages du pool (surchargeables par la section `postgres` de config.yaml)
+REGLAGES = {
+    "taille_pool": 5,          # connexions gardées ouvertes
+    "debordement": 10,         # connexions supplémentaires en pointe (chargement parallèle...)
+    "pre_ping": True,          # vérifie la connexion avant de la prêter (redémarrage du serveur, coupure réseau)
+    "recyclage": 1800,         # secondes avant de renouveler une connexion
+    "cache_requetes": 500,     # requêtes compilées gardées en cache par SQLAlchemy
+}
+
+
+def parametres(profil="joconde"):
+    """Paramètres de connexion du profil, variables d'environnement comprises"""
+    valeurs = PROFILS[profil]
+    resultat = {
+        cle: os.getenv(f"{valeurs['prefixe']}{cle.upper()}", defaut)
+        for cle, defaut in valeurs.items() if cle != "prefixe"
+    }
+    manquantes = [f"{valeurs['prefixe']}{cle.upper()}" for cle, valeur in resultat.items() if valeur is None]
+    if manquantes:
+        raise RuntimeError(f"Profil '{profil}' : variables d'environnement manquantes {manquantes} (voir .env_staging)")
+    return resultat
+
+
+def url(profil="joconde", base=None):
+    # URL.create : pas d'échappement à faire sur les caractères spéciaux du mot de passe
+    p = parametres(profil)
+    return URL.create(
+        "postgresql+psycopg2",  # COPY de chargement.py : API copy_expert de psycopg2
+        username=p["user"],
+        password=p["password"],
+        host=p["host"],
+        port=int(p["port"]),
+        database=base or p["db"],
+    )
+
+
+@lru_cache(maxsize=None)
+def moteur(profil="joconde", taille_pool=5, debordement=10, pre_ping=True, recyclage=1800, cache_requetes=500):
+    """Engine du profil, créé une seule fois par processus et partagé par toutes les étapes"""
+    engine = create_engine(
+        url(profil),
+        pool_size=taille_pool,
+        max_overflow=debordement,
+        pool_pre_ping=pre_ping,
+        pool_recycle=recyclage,
+        query_cache_size=cache_requetes,
+        executemany_mode="values_plus_batch",
+    )
+    logging.info(f"🐳 Pool PostgreSQL '{profil}' : {engine.url.render_as_string(hide_password=True)} "
+                 f"({taille_pool} + {debordement} connexions)")
+    return engine
+
+
+def moteur_config(config, profil="joconde"):
+    """Engine partagé avec les réglages de la section `postgres` de config.yaml"""
+    return moteur(profil, **{**REGLAGES, **config.get("postgres", {})})
+
+
+@lru_cache(maxsize=None)
+def assurer_base(profil="joconde"):
+    """Crée la base du profil si elle n'existe pas (vérifié une fois par processus)"""
+    base = parametres(profil)["db"]
+    # Connexion d'administration ponctuelle : pas de pool à garder ouvert
+    admin = create_engine(url(profil, base=BASE_ADMIN), poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    try:
+        with admin.connect() as conn:
+            if not conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :base"), {"base": base}).fetchone():
+                logging.info(f"🔨 Création de la base de données '{base}'")
+                conn.exec_driver_sql(f'CREATE DATABASE "{base}"')
+                logging.info(f"✅ Base de données '{base}' créée")
+    finally:
+        admin.dispose()
+    return base
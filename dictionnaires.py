@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+from contextlib import contextmanager
+import polars as pl
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou de fichier, un seul chargement à la fois
+    fcntl = None
+
+# Colonnes à faible cardinalité (quelques dizaines à quelques milliers de valeurs pour des millions de notices)
+COLONNES_CATEGORIELLES = [
+    "region",
+    "departement",
+    "denomination",
+    "ville",
+    "nom_officiel_musee",
+    "presence_image",
+]
+FICHIER_DICTIONNAIRE = "dictionnaire_joconde.json"
+
+
+def charger_dictionnaire(chemin=FICHIER_DICTIONNAIRE):
+    """Dictionnaire global persistant {colonne: [valeurs]} : l'indice d'une valeur est son code"""
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sauvegarder_dictionnaire(dictionnaire, chemin=FICHIER_DICTIONNAIRE):
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        json.dump(dictionnaire, f, ensure_ascii=False, indent=2)
+    os.replace(temporaire, chemin)
+
+
+@contextmanager
+def _verrou(chemin):
+    """Verrou exclusif sur le dictionnaire (fichier "<chemin>.lock"), partagé entre processus"""
+    with open(f"{chemin}.lock", "w") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def type_enum(dictionnaire, colonne):
+    return pl.Enum(dictionnaire.get(colonne, []))
+
+
+def completer(dictionnaire, df, colonnes):
+    """Ajoute en fin de dictionnaire les valeurs jamais vues : les codes existants ne changent jamais"""
+    nouvelles = {}
+    for nom, valeurs in df.select(pl.col(colonnes).unique().implode()).row(0, named=True).items():
+        connues = set(dictionnaire.get(nom, []))
+        ajouts = sorted(v for v in valeurs if v is not None and v not in connues)
+        if ajouts:
+            dictionnaire.setdefault(nom, []).extend(ajouts)
+            nouvelles[nom] = len(ajouts)
+    return nouvelles
+
+
+def encoder(df, chemin=FICHIER_DICTIONNAIRE, colonnes=None):
+    """Encode les colonnes catégorielles en Enum selon le dictionnaire global (complété si besoin)"""
+    colonnes = [c for c in (colonnes or COLONNES_CATEGORIELLES) if c in df.columns and df.schema[c] == pl.Utf8]
+    if not colonnes:
+        return df
+    dictionnaire = charger_dictionnaire(chemin)
+    try:
+        return df.with_columns([pl.col(c).cast(type_enum(dictionnaire, c)) for c in colonnes])
+    except pl.ComputeError:
+        # Valeurs absentes du dictionnaire : on le complète puis on réencode. Relu sous verrou :
+        # les valeurs ajoutées entre-temps par un autre chargement sont conservées, à leur place
+        with _verrou(chemin):
+            dictionnaire = charger_dictionnaire(chemin)
+            nouvelles = completer(dictionnaire, df, colonnes)
+            if nouvelles:
+                sauvegarder_dictionnaire(dictionnaire, chemin)
+        logging.info(f"📖 Dictionnaire {chemin} complété : {nouvelles}")
+        return df.with_columns([pl.col(c).cast(type_enum(dictionnaire, c)) for c in colonnes])
+
+
+def valeurs_connues(valeurs, colonne, chemin=FICHIER_DICTIONNAIRE):
+    """Série Enum des valeurs présentes dans le dictionnaire, pour des `is_in` sur les codes entiers"""
+    dictionnaire = charger_dictionnaire(chemin)
+    connues = set(dictionnaire.get(colonne, []))
+    return pl.Series(colonne, [v for v in valeurs if v in connues], dtype=type_enum(dictionnaire, colonne))
@@ -0,0 +1,123 @@
+import io
+import logging
+import polars as pl
+from sqlalchemy import text
+import chargement
+
+# Le hachage de Polars n'est stable qu'à version égale : la version fait partie de l'empreinte,
+# une montée de version de Polars fait donc repasser toutes les notices une fois dans le merge
+VERSION_EMPREINTE = f"1-polars-{pl.__version__}"
+GRAINES = (0x4A6F636F, 0x6E646531, 0x48617368, 0x32303235)
+SEPARATEUR = "\x1f"
+NUL = "\x00"  # distingue une valeur nulle d'une chaîne vide
+
+TABLE_EMPREINTES = "joconde_oeuvres_temporelle_hash"
+TABLE_DELTA = "staging.joconde_delta"
+# Colonnes de joconde_oeuvres_temporelle comparées par 03.08.02.merge.sql
+COLONNES_METIER = ["appellation", "auteur", "annee_creation", "departement", "description"]
+
+
+def preparer(lf):
+    """Mêmes valeurs que celles écrites dans joconde_oeuvres_temporelle par le merge (TRIM, année sur 4 chiffres)"""
+    annee = pl.col("date_creation").str.slice(0, 4)
+    return lf.select([
+        pl.col("reference").str.strip_chars(" "),
+        pl.col("appellation").str.strip_chars(" "),
+        pl.col("auteur").str.strip_chars(" "),
+        pl.when(annee.str.contains(r"^\d{4}$")).then(annee.cast(pl.Int32, strict=False)).alias("annee_creation"),
+        pl.col("departement").str.strip_chars(" "),
+        pl.col("description"),
+    ]).filter(pl.col("reference").is_not_null()).unique(subset="reference", keep="last", maintain_order=True)
+
+
+def calculer(df, colonnes=COLONNES_METIER):
+    """Ajoute l'empreinte (BIGINT) du contenu métier de chaque ligne, calculée en une passe vectorisée"""
+    contenu = pl.concat_str(
+        [pl.col(c).cast(pl.Utf8).fill_null(NUL) for c in colonnes], separator=SEPARATEUR
+    )
+    return df.with_columns(contenu.hash(*GRAINES).reinterpret(signed=True).alias("empreinte"))
+
+
+def creer_tables(conn, table_empreintes=TABLE_EMPREINTES, table_delta=TABLE_DELTA):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {table_empreintes} (
+            reference VARCHAR(50) PRIMARY KEY,
+            empreinte BIGINT NOT NULL,
+            version TEXT NOT NULL
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {table_delta} (
+            operation CHAR(1) NOT NULL,
+            reference VARCHAR(50) NOT NULL,
+            appellation TEXT,
+            auteur TEXT,
+            annee_creation INTEGER,
+            departement VARCHAR(100),
+            description TEXT,
+            load_timestamp_utc TIMESTAMPTZ,
+            source_system VARCHAR(50)
+        )
+    """))
+
+
+def lire(conn, table=TABLE_EMPREINTES):
+    """Empreintes déjà publiées, lues en bloc par COPY TO"""
+    tampon = io.BytesIO()
+    curseur = conn.connection.driver_connection.cursor()
+    try:
+        curseur.copy_expert(f"COPY (SELECT reference, empreinte, version FROM {table}) TO STDOUT WITH (FORMAT csv)", tampon)
+    finally:
+        curseur.close()
+    schema = {"reference": pl.Utf8, "empreinte": pl.Int64, "version": pl.Utf8}
+    if not tampon.tell():
+        return pl.DataFrame(schema=schema)
+    tampon.seek(0)
+    return pl.read_csv(tampon, has_header=False, new_columns=list(schema), dtypes=schema)
+
+
+def detecter(df, anciennes, complet=True):
+    """Insertions, mises à jour et (si `df` est un export complet) suppressions par rapport aux empreintes publiées"""
+    publiees = anciennes.rename({"empreinte": "empreinte_publiee", "version": "version_publiee"})
+    comparaison = df.join(publiees, on="reference", how="left")
+    modifiee = (pl.col("empreinte") != pl.col("empreinte_publiee")) | (pl.col("version_publiee") != VERSION_EMPREINTE)
+    changements = {
+        "I": comparaison.filter(pl.col("empreinte_publiee").is_null()),
+        "U": comparaison.filter(pl.col("empreinte_publiee").is_not_null() & modifiee),
+    }
+    changements = {op: lignes.drop(["empreinte_publiee", "version_publiee"]) for op, lignes in changements.items()}
+    # Une référence absente d'un export complet a été supprimée du catalogue
+    changements["D"] = (
+        anciennes.join(df, on="reference", how="anti").select("reference")
+        if complet else pl.DataFrame(schema={"reference": pl.Utf8})
+    )
+    logging.info(
+        f"🔎 {df.height} notices comparées : {changements['I'].height} insertions, "
+        f"{changements['U'].height} mises à jour, {changements['D'].height} suppressions"
+    )
+    return changements
+
+
+def publier_delta(conn, changements, constantes=None, table=TABLE_DELTA):
+    """Remplace le contenu de la table delta par les seules notices modifiées (colonne `operation` : I, U ou D)"""
+    conn.execute(text(f"TRUNCATE TABLE {table}"))
+    lots = [
+        lignes.select(pl.exclude("empreinte")).with_columns(pl.lit(op).alias("operation"))
+        for op, lignes in changements.items() if lignes.height
+    ]
+    return chargement.copier(conn, lots, table, constantes)
+
+
+def enregistrer(conn, changements, table=TABLE_EMPREINTES):
+    """Met à jour les empreintes publiées, dans la transaction du merge"""
+    supprimees = changements["D"]
+    if supprimees.height:
+        conn.execute(
+            text(f"DELETE FROM {table} WHERE reference = ANY(:references)"),
+            {"references": supprimees["reference"].to_list()},
+        )
+    nouvelles = pl.concat([changements["I"], changements["U"]]).select(
+        "reference", "empreinte", pl.lit(VERSION_EMPREINTE).alias("version")
+    )
+    if nouvelles.height:
+        chargement.fusionner(conn, nouvelles, table, cle="reference")
@@ -1,19 +1,16 @@
 from dagster import asset
-import polars as pl
-import os
 import sys
 sys.path.append('..')
 from utils import get_config
+import cache_feather
+import extraction
+from functools import partial
 
 @asset
-def donnees_brutes() -> pl.DataFrame:
+def donnees_brutes() -> str:
+    """Chemin de l'entrée de cache feather : les assets aval la projettent en mémoire sans copie"""
     config = get_config()
     source = config["fichiers"]["source"]
     cache = config["fichiers"]["cache"]
-    
-    if os.path.exists(cache):
-        return pl.read_ipc(cache)
-    else:
-        df = pl.read_json(source, infer_schema_length=None)
-        df.write_ipc(cache)
-        return df
+    charger_source = partial(extraction.charger_json_parallele, nb_processus=config.get("extraction", {}).get("processus"))
+    return cache_feather.assurer(source, cache, charger_source=charger_source, **config.get("cache", {}))
@@ -1,41 +1,20 @@
 from dagster import asset
-from sqlalchemy import MetaData, create_engine, text, insert
 import sys
 sys.path.append('..')
+import chargement
 from utils import get_config
+from resources import PostgresResource
 
 @asset
-def chargement_postgresql(donnees_transformees):
+def chargement_postgresql(donnees_transformees, postgres: PostgresResource):
     config = get_config()
     
-    DB_CONFIG = {
-        'user': 'joconde_import',
-        'password': 'MsacR%GK85.VoykyEU',
-        'host': 'localhost',
-        'port': '5434',
-        'database': 'joconde_staging',
-        'schema': 'staging'
-    }
-    
-    engine = create_engine(
-        f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-        f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}",
-        executemany_mode='values_plus_batch'
+    # Table fantôme remplie (COPY), indexée et analysée, puis substituée par renommage :
+    # les lecteurs de la table ne sont bloqués que le temps de la bascule.
+    # Colonnes d'audit ajoutées par tranche ; load_timestamp_utc fixé une fois pour tout le chargement
+    # (la table de staging PostgreSQL n'a pas de valeur par défaut pour cette colonne)
+    chargement.charger_par_bascule(
+        postgres.moteur(), donnees_transformees, config["staging"]["table"],
+        nb_connexions=config.get("chargement", {}).get("connexions", 1),
+        constantes=chargement.colonnes_audit(config, horodatage=True),
     )
-    
-    metadata = MetaData(schema=DB_CONFIG['schema'])
-    metadata.reflect(bind=engine)
-    table = metadata.tables[config["staging"]["table"]]
-    
-    records = [
-        {
-            **row,
-            "source_system": config["audit"]["source_system"],
-            "load_process": config["audit"]["load_process"]
-        }
-        for row in donnees_transformees.to_dicts()
-    ]
-    
-    with engine.begin() as conn:
-        conn.execute(text(f"TRUNCATE TABLE {config['staging']['table']};"))
-        conn.execute(insert(table), records)
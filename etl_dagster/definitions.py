@@ -4,6 +4,10 @@ from assets.extract import donnees_brutes
 from assets.transform import donnees_transformees
 from assets.load import chargement_postgresql
 from assets.dbt_assets import dbt_models
+from resources import PostgresResource
+from utils import get_config
+
+config = get_config()
 
 defs = Definitions(
     assets=[
@@ -13,6 +17,7 @@ defs = Definitions(
         dbt_models
     ],
     resources={
-        "dbt": DbtCliResource(project_dir="/Users/macbook/etl-python-sql-5256047/dbt/joconde")
+        "dbt": DbtCliResource(project_dir="/Users/macbook/etl-python-sql-5256047/dbt/joconde"),
+        "postgres": PostgresResource(profil="staging", **config.get("postgres", {}))
     }
 )
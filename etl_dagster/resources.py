@@ -0,0 +1,26 @@
+from dagster import ConfigurableResource
+import sys
+sys.path.append('..')
+import connexion
+
+
+class PostgresResource(ConfigurableResource):
+    """Accès PostgreSQL partagé par les assets : un pool par processus"""
+
+    profil: str = "staging"
+    taille_pool: int = 5
+    debordement: int = 10
+    pre_ping: bool = True
+    recyclage: int = 1800
+    cache_requetes: int = 500
+
+    def moteur(self):
+        # connexion.moteur est mis en cache : chaque matérialisation du processus réutilise le même pool
+        return connexion.moteur(
+            self.profil,
+            taille_pool=self.taille_pool,
+            debordement=self.debordement,
+            pre_ping=self.pre_ping,
+            recyclage=self.recyclage,
+            cache_requetes=self.cache_requetes,
+        )
@@ -0,0 +1,360 @@
+import contextlib
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import polars as pl
+import schema_joconde
+
+TAILLE_LOT = 50_000          # nombre de notices par lot
+TAILLE_LECTURE = 1 << 20     # 1 Mo lu à la fois sur le disque
+TAILLE_MORCEAU_MO = 64       # taille d'une plage d'octets analysée en une fois
+
+SEPARATEUR_CSV = ";"
+SEPARATEUR_LISTE_CSV = ","  # les champs multivalués (domaine...) sont joints par des virgules dans l'export CSV
+
+# En-têtes CSV dont la forme normalisée ne correspond pas au nom du registre
+ALIAS_CSV = {
+    "ref": "reference",
+    "lieu_de_creation": "lieu_de_creation_utilisation",
+    "nom_officiel_du_musee": "nom_officiel_musee",
+    "materiaux_technique": "materiaux_techniques",
+}
+
+# Candidat de frontière entre deux notices du tableau racine : "}" puis "," puis "{"
+_FRONTIERE = re.compile(rb"\}\s*,\s*\{")
+# Clé d'objet JSON et valeur nulle éventuelle : hors d'une chaîne, une clé suit toujours "{" ou ","
+# (dans une chaîne, le guillemet est échappé) ; les clés d'objets imbriqués sont comptées aussi
+_CLE = re.compile(rb'[{,]\s*"((?:[^"\\]|\\.)*)"\s*:\s*(n)?')
+
+
+def _sauter_blancs(tampon, pos):
+    while pos < len(tampon) and tampon[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+def iterer_notices(path, taille_lecture=TAILLE_LECTURE):
+    """Parcourt le tableau JSON racine notice par notice (chemin ou fichier texte ouvert), sans tout charger"""
+    decodeur = json.JSONDecoder()
+    ouverture = open(path, encoding="utf-8") if isinstance(path, (str, os.PathLike)) else contextlib.nullcontext(path)
+    with ouverture as f:
+        tampon = f.read(taille_lecture)
+        fin_fichier = False
+        pos = _sauter_blancs(tampon, 0)
+        if tampon[pos:pos + 1] != "[":
+            raise ValueError(f"{path} : le fichier doit contenir un tableau JSON")
+        pos += 1
+
+        while True:
+            pos = _sauter_blancs(tampon, pos)
+
+            if pos < len(tampon):
+                if tampon[pos] == "]":
+                    return
+                if tampon[pos] == ",":
+                    pos += 1
+                    continue
+                try:
+                    notice, fin_notice = decodeur.raw_decode(tampon, pos)
+                except json.JSONDecodeError:
+                    pass
+                else:
+                    yield notice
+                    pos = fin_notice
+                    # Libérer la partie déjà consommée du tampon
+                    if pos > taille_lecture:
+                        tampon = tampon[pos:]
+                        pos = 0
+                    continue
+
+            # Fin de tampon ou notice coupée : on lit la suite et on réessaie
+            if fin_fichier:
+                raise ValueError(f"{path} : tableau JSON tronqué ou invalide")
+            suite = f.read(taille_lecture)
+            fin_fichier = not suite
+            tampon = tampon[pos:] + suite
+            pos = 0
+
+
+def construire_lot(notices, source=""):
+    """Construit un DataFrame au schéma du registre Joconde, sans inférence de types"""
+    schema_joconde.detecter_derive(set().union(*(n.keys() for n in notices)), source)
+    colonnes_liste = schema_joconde.colonnes_liste()
+    for notice in notices:
+        for nom in colonnes_liste:
+            valeur = notice.get(nom)
+            if valeur is not None and not isinstance(valeur, list):
+                notice[nom] = [valeur]
+    try:
+        return pl.from_dicts(notices, schema=schema_joconde.schema_polars())
+    except pl.ComputeError:
+        # Types inattendus dans le lot : normalisation notice par notice
+        logging.warning(f"⚠️  Valeurs hors schéma Joconde v{schema_joconde.SCHEMA_VERSION} {source} : normalisation du lot")
+        notices = [schema_joconde.normaliser_notice(n) for n in notices]
+        return pl.from_dicts(notices, schema=schema_joconde.schema_polars())
+
+
+def _est_debut_notice(f, position):
+    """Vérifie qu'une suite de notices du registre commence bien à `position` (et pas dans un texte)"""
+    f.seek(position)
+    fenetre = f.read(TAILLE_LECTURE * 4)
+    fin_fichier = len(fenetre) < TAILLE_LECTURE * 4
+    fenetre = fenetre.decode("utf-8", errors="ignore")
+    decodeur = json.JSONDecoder()
+    colonnes = schema_joconde.schema_polars().keys()
+    pos, nb_notices = 0, 0
+    # Une position prise au milieu d'un texte finit toujours par échouer avant la fin de la fenêtre
+    while True:
+        try:
+            notice, pos = decodeur.raw_decode(fenetre, pos)
+        except json.JSONDecodeError:
+            # Seule la dernière notice, coupée par la fenêtre, a le droit d'échouer
+            return not fin_fichier and nb_notices > 0 and pos > len(fenetre) - TAILLE_LECTURE
+        if not isinstance(notice, dict) or len(notice.keys() & colonnes) * 2 < len(notice):
+            return False
+        nb_notices += 1
+        pos = _sauter_blancs(fenetre, pos)
+        if fenetre[pos:pos + 1] == "]":
+            return True
+        if fenetre[pos:pos + 1] != ",":
+            return not fin_fichier and pos >= len(fenetre)
+        pos = _sauter_blancs(fenetre, pos + 1)
+
+
+def _prochaine_notice(f, position, taille):
+    """Première frontière de notice valide à partir de `position`"""
+    while position < taille:
+        f.seek(position)
+        bloc = f.read(TAILLE_LECTURE)
+        for m in _FRONTIERE.finditer(bloc):
+            debut = position + m.end() - 1
+            if _est_debut_notice(f, debut):
+                return debut
+        if len(bloc) < TAILLE_LECTURE:
+            break
+        position += len(bloc) - 64  # recouvrement pour ne pas couper un séparateur
+    return taille
+
+
+def decouper_plages(path, taille_morceau_mo=TAILLE_MORCEAU_MO):
+    """Découpe le fichier en plages d'octets alignées sur des débuts de notices"""
+    taille = os.path.getsize(path)
+    pas = taille_morceau_mo * 1024**2
+    with open(path, "rb") as f:
+        debut = f.read(TAILLE_LECTURE).index(b"[") + 1
+        bornes = [debut]
+        for cible in range(debut + pas, taille, pas):
+            borne = _prochaine_notice(f, max(cible, bornes[-1]), taille)
+            if borne >= taille:
+                break
+            if borne > bornes[-1]:
+                bornes.append(borne)
+    bornes.append(taille)
+    return list(zip(bornes[:-1], bornes[1:]))
+
+
+def _valeurs_brutes(contenu):
+    """Clés présentes et nombre de valeurs non nulles par clé, relevés sur le texte JSON de toute la plage"""
+    # Comptage au fil des correspondances : la mémoire dépend du nombre de clés distinctes, pas de la plage
+    comptes = Counter((m.group(1), m.group(2) is None) for m in _CLE.finditer(contenu))
+    presentes, brutes = set(), Counter()
+    for (cle, non_nulle), nombre in comptes.items():
+        cle = cle.decode("utf-8", errors="replace")
+        presentes.add(cle)
+        if non_nulle:
+            brutes[cle] += nombre
+    return presentes, brutes
+
+
+def _lecture_native(contenu, source):
+    """Analyseur natif de Polars avec le schéma du registre, ou None si une valeur de la plage y serait perdue"""
+    # L'analyse native remplace sans le signaler une valeur hors schéma par null : chaque colonne doit
+    # garder autant de valeurs non nulles que le texte de la plage en contient, clés inconnues comprises
+    presentes, brutes = _valeurs_brutes(contenu)
+    schema = schema_joconde.schema_polars()
+    if presentes - schema.keys():
+        return None
+    try:
+        df = pl.read_json(io.BytesIO(b"[" + contenu + b"]"), schema=schema)
+    except Exception:
+        return None
+    nulles = df.null_count().row(0, named=True)
+    if any(df.height - nulles[nom] != brutes.get(nom, 0) for nom in schema):
+        return None
+    schema_joconde.detecter_derive(presentes, source)
+    return df
+
+
+def analyser_plage(path, debut, fin, taille_lot=TAILLE_LOT):
+    """Analyse les notices d'une plage d'octets (exécuté dans un processus du pool)"""
+    with open(path, "rb") as f:
+        f.seek(debut)
+        contenu = f.read(fin - debut).strip().rstrip(b"]").rstrip().rstrip(b",")
+
+    # Chemin rapide : analyseur natif de Polars, si aucune valeur de la plage n'est hors schéma
+    df = _lecture_native(contenu, path)
+    if df is not None:
+        return df
+
+    # Valeurs hors schéma : analyse notice par notice avec normalisation (et signalement de la dérive)
+    logging.info(f"🐢 {path} [{debut}:{fin}] : valeurs hors schéma, analyse notice par notice")
+    lots, notices = [], []
+    for notice in iterer_notices(io.StringIO("[" + contenu.decode("utf-8") + "]")):
+        notices.append(notice)
+        if len(notices) >= taille_lot:
+            lots.append(construire_lot(notices, path))
+            notices = []
+    if notices:
+        lots.append(construire_lot(notices, path))
+    if not lots:
+        return pl.DataFrame(schema=schema_joconde.schema_polars())
+    return pl.concat(lots, rechunk=False)
+
+
+def lire_json_par_lots(path, taille_lot=TAILLE_LOT, taille_morceau_mo=TAILLE_MORCEAU_MO):
+    """Lit le fichier JSON par lots de `taille_lot` notices (DataFrame Polars)"""
+    # Une seule plage d'octets en mémoire à la fois, quelle que soit la taille du fichier
+    for debut, fin in decouper_plages(path, taille_morceau_mo):
+        df = analyser_plage(path, debut, fin, taille_lot)
+        for offset in range(0, df.height, taille_lot):
+            yield df.slice(offset, taille_lot)
+
+
+def charger_json(path, taille_lot=TAILLE_LOT):
+    """Charge le fichier JSON complet en assemblant les lots (sans recopie finale)"""
+    lots = list(lire_json_par_lots(path, taille_lot))
+    if not lots:
+        return pl.DataFrame(schema=schema_joconde.schema_polars())
+    df = pl.concat(lots, rechunk=False)
+    schema_joconde.verifier_nullabilite(df, path)
+    return df
+
+
+def lire_json_parallele_par_lots(path, nb_processus=None, taille_morceau_mo=TAILLE_MORCEAU_MO):
+    """Analyse les plages d'octets dans un pool de processus et restitue les lots dans l'ordre du fichier"""
+    # À appeler sous `if __name__ == "__main__":` ou depuis un orchestrateur :
+    # les processus du pool réimportent le module principal
+    plages = decouper_plages(path, taille_morceau_mo)
+    nb_processus = nb_processus or os.cpu_count()
+    logging.info(f"⚡ {len(plages)} plages analysées par {nb_processus} processus")
+    # "spawn" : un fork après le démarrage des threads Polars peut bloquer les processus fils
+    with ProcessPoolExecutor(max_workers=nb_processus, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Au plus `nb_processus` plages soumises d'avance : un lot n'est analysé que si le précédent a été consommé
+        en_cours = deque()
+        for debut, fin in plages:
+            if len(en_cours) >= nb_processus:
+                yield en_cours.popleft().result()
+            en_cours.append(pool.submit(analyser_plage, path, debut, fin))
+        while en_cours:
+            yield en_cours.popleft().result()
+
+
+def charger_json_parallele(path, nb_processus=None, taille_morceau_mo=TAILLE_MORCEAU_MO):
+    """Charge le fichier JSON complet en parallèle, lots concaténés dans l'ordre"""
+    lots = list(lire_json_parallele_par_lots(path, nb_processus, taille_morceau_mo))
+    if not lots:
+        return pl.DataFrame(schema=schema_joconde.schema_polars())
+    df = pl.concat(lots, rechunk=False)
+    schema_joconde.verifier_nullabilite(df, path)
+    return df
+
+
+def nom_canonique(entete):
+    """Nom du registre correspondant à un en-tête CSV ("Reference", "DateDeMiseAJour", "Précisions sur l'auteur"...)"""
+    nom = unicodedata.normalize("NFKD", entete.strip()).encode("ascii", "ignore").decode()
+    nom = re.sub(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])", "_", nom).lower()
+    nom = re.sub(r"[^a-z0-9]+", "_", nom).strip("_")
+    return ALIAS_CSV.get(nom, nom)
+
+
+def lire_entetes_csv(path, separateur=SEPARATEUR_CSV):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return next(csv.reader(f, delimiter=separateur), [])
+
+
+def lire_csv_par_lots(path, taille_lot=TAILLE_LOT, separateur=SEPARATEUR_CSV, nb_threads=None):
+    """Lit l'export CSV par lots de `taille_lot` notices, aux noms et types du registre"""
+    noms = [nom_canonique(e) for e in lire_entetes_csv(path, separateur)]
+    if not noms:
+        return
+    nb_threads = nb_threads or os.cpu_count()
+    # Tout en Utf8 comme le registre : aucune inférence de types sur un échantillon
+    lecteur = pl.read_csv_batched(
+        path,
+        separator=separateur,
+        new_columns=noms,
+        dtypes=[pl.Utf8] * len(noms),
+        infer_schema_length=0,
+        batch_size=taille_lot,
+        n_threads=nb_threads,
+        encoding="utf8-lossy",
+        rechunk=False,
+    )
+    # Chaque appel analyse plusieurs morceaux du fichier en parallèle (threads Polars)
+    while lots := lecteur.next_batches(nb_threads):
+        for lot in lots:
+            yield schema_joconde.conformer(lot, path, separateur_liste=SEPARATEUR_LISTE_CSV)
+
+
+def charger_csv(path, taille_lot=TAILLE_LOT, separateur=SEPARATEUR_CSV, nb_threads=None):
+    """Charge l'export CSV complet en assemblant les lots (sans recopie finale)"""
+    lots = list(lire_csv_par_lots(path, taille_lot, separateur, nb_threads))
+    if not lots:
+        return pl.DataFrame(schema=schema_joconde.schema_polars())
+    df = pl.concat(lots, rechunk=False)
+    schema_joconde.verifier_nullabilite(df, path)
+    return df
+
+
+def lire_par_lots(path, taille_lot=TAILLE_LOT):
+    """Lots au schéma du registre, quel que soit le format de l'export (JSON ou CSV)"""
+    if path.lower().endswith(".csv"):
+        return lire_csv_par_lots(path, taille_lot)
+    return lire_json_par_lots(path, taille_lot)
+
+
+def charger(path, taille_lot=TAILLE_LOT):
+    """Charge l'export complet (JSON ou CSV) au schéma du registre"""
+    if path.lower().endswith(".csv"):
+        return charger_csv(path, taille_lot)
+    return charger_json(path, taille_lot)
+
+
+def benchmark(path, nb_processus=None, path_csv=None):
+    """Compare pl.read_json, l'extraction en flux, l'extraction parallèle et, si fourni, l'export CSV"""
+    methodes = {
+        "pl.read_json (inférence complète)": lambda: pl.read_json(path, infer_schema_length=None),
+        f"extraction en flux (plages de {TAILLE_MORCEAU_MO} Mo)": lambda: charger_json(path),
+        f"extraction parallèle ({nb_processus or os.cpu_count()} processus)": lambda: charger_json_parallele(path, nb_processus),
+    }
+    if path_csv:
+        methodes["extraction CSV (lots parallèles)"] = lambda: charger_csv(path_csv)
+    resultats = {}
+    for nom, methode in methodes.items():
+        debut = time.perf_counter()
+        df = methode()
+        resultats[nom] = (time.perf_counter() - debut, df.height)
+        print(f"⏱ {nom:45} : {resultats[nom][0]:8.2f} sec ({df.height:,} lignes)")
+    return resultats
+
+
+if __name__ == "__main__":
+    import yaml
+
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    benchmark(
+        config["fichiers"]["source"],
+        config.get("extraction", {}).get("processus"),
+        config["fichiers"].get("source_csv"),
+    )
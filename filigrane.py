@@ -0,0 +1,64 @@
+import logging
+import polars as pl
+from sqlalchemy import text
+
+# État des chargements incrémentaux : une ligne par source, mise à jour dans la transaction du chargement
+TABLE_FILIGRANE = "staging.etl_filigrane"
+COLONNE_DATE = "date_de_mise_a_jour"
+FORMAT_DATE = "%Y-%m-%d"
+
+
+def creer_table(conn, table=TABLE_FILIGRANE):
+    schema, _, _ = table.rpartition(".")
+    if schema:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            source TEXT PRIMARY KEY,
+            filigrane DATE,  -- NULL : source enregistrée par lire mais jamais chargée
+            nb_lignes BIGINT,
+            mis_a_jour_utc TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def lire(conn, source, table=TABLE_FILIGRANE):
+    """Filigrane de la source (None au premier chargement), verrouillé jusqu'à la fin de la transaction"""
+    # La ligne doit exister pour être verrouillée : au premier chargement, la seconde exécution attend
+    # ici que la première ait validé son insertion
+    conn.execute(
+        text(f"INSERT INTO {table} (source) VALUES (:source) ON CONFLICT (source) DO NOTHING"), {"source": source}
+    )
+    # FOR UPDATE : deux exécutions concurrentes sur la même source se succèdent au lieu de se chevaucher
+    return conn.execute(
+        text(f"SELECT filigrane FROM {table} WHERE source = :source FOR UPDATE"), {"source": source}
+    ).scalar()
+
+
+def avancer(conn, source, filigrane, nb_lignes, table=TABLE_FILIGRANE):
+    """Avance le filigrane (jamais en arrière) ; validé avec les données, ou annulé avec elles"""
+    if filigrane is None:
+        return
+    conn.execute(text(f"""
+        INSERT INTO {table} (source, filigrane, nb_lignes, mis_a_jour_utc)
+        VALUES (:source, :filigrane, :nb_lignes, CURRENT_TIMESTAMP)
+        ON CONFLICT (source) DO UPDATE SET
+            filigrane = GREATEST({table.rpartition('.')[2]}.filigrane, EXCLUDED.filigrane),
+            nb_lignes = EXCLUDED.nb_lignes,
+            mis_a_jour_utc = EXCLUDED.mis_a_jour_utc
+    """), {"source": source, "filigrane": filigrane, "nb_lignes": nb_lignes})
+    logging.info(f"🔖 Filigrane {source} : {filigrane} ({nb_lignes} lignes)")
+
+
+def filtrer(lf, filigrane, colonne=COLONNE_DATE, format_date=FORMAT_DATE):
+    """Notices mises à jour depuis le filigrane (toutes au premier chargement), et celles sans date
+
+    Les notices sans date (ou à la date illisible) sont rejouées à chaque passage incrémental : l'upsert les rend
+    sans effet, mais leur nombre s'ajoute à chaque chargement (journalisé par 02.09)
+    """
+    lf = lf.with_columns(pl.col(colonne).str.strptime(pl.Date, format_date, strict=False))
+    if filigrane is None:
+        return lf
+    # >= : le jour du filigrane est rejoué (notices publiées après le dernier passage), l'upsert le rend sans effet
+    # Sans date, une notice ne peut pas être située par rapport au filigrane : elle est rejouée à chaque passage
+    return lf.filter((pl.col(colonne) >= filigrane) | pl.col(colonne).is_null())
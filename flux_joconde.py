@@ -0,0 +1,508 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import polars as pl
+from sqlalchemy import text
+import chargement
+import extraction
+
+# Colonnes de la table joconde alimentée par le watcher (02.06)
+COLONNES = ["reference", "appellation", "auteur", "date_creation", "denomination",
+            "region", "departement", "ville", "description"]
+
+# Un micro-lot est écrit dès que l'une des deux limites est atteinte
+NB_LIGNES_MAX = 20_000   # lignes en attente
+DELAI_MAX_MS = 200       # attente de la plus ancienne ligne (latence bornée)
+TAILLE_FILE = 64         # fichiers analysés en attente d'écriture (au-delà, les producteurs attendent)
+
+# Détection des fichiers complets et pool d'analyse
+MARQUEUR = ".pret"       # fichier témoin "x.json.pret" déposé par un écrivain une fois "x.json" terminé
+STABILITE_MS = 100       # sans témoin ni renommage : taille et date inchangées depuis STABILITE_MS
+INTERVALLE_MS = 20       # fréquence de contrôle des fichiers en cours d'écriture
+NB_WORKERS = 4
+FICHIERS_EN_COURS = 256  # fichiers prêts en cours d'analyse ou d'écriture (au-delà, la détection attend)
+
+# Registre des fichiers ingérés, alimenté dans la transaction des données
+TABLE_JOURNAL = "journal_ingestion"
+
+_FIN = object()
+
+
+def analyser(contenu, source=""):
+    """Contenu d'un fichier déposé (tableau JSON ou NDJSON) -> DataFrame aux colonnes de la table joconde"""
+    if contenu.lstrip()[:1] == b"[":
+        notices = json.loads(contenu)
+    else:
+        # NDJSON : une notice par ligne
+        notices = [json.loads(ligne) for ligne in contenu.splitlines() if ligne.strip()]
+    if not notices:
+        return pl.DataFrame(schema={c: pl.Utf8 for c in COLONNES})
+    return extraction.construire_lot(notices, source).select(COLONNES)
+
+
+def lire_fichier(chemin):
+    with open(chemin, "rb") as f:
+        return analyser(f.read(), chemin)
+
+
+def empreinte_contenu(contenu):
+    return hashlib.sha256(contenu).hexdigest()
+
+
+def archiver(chemin, dossier_archive):
+    """Déplace le fichier dans l'archive et supprime son témoin ".pret" (quel que soit le chemin d'archivage)"""
+    destination = os.path.join(dossier_archive, os.path.basename(chemin))
+    shutil.move(chemin, destination)
+    if os.path.exists(chemin + MARQUEUR):
+        os.remove(chemin + MARQUEUR)
+    return destination
+
+
+class Journal:
+    """Registre des fichiers ingérés (empreinte du contenu), avec son index en mémoire chargé au démarrage"""
+
+    def __init__(self, engine, table=TABLE_JOURNAL):
+        self.engine, self.table = engine, table
+        self.connues = set()    # empreintes validées en base
+        self.reservees = set()  # empreintes en cours d'écriture
+        self.en_attente = {}    # empreinte en cours d'écriture -> autres fichiers au contenu identique
+        self.verrou = threading.Lock()
+
+    def creer_table(self):
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    empreinte CHAR(64) PRIMARY KEY,
+                    fichier TEXT NOT NULL,
+                    taille BIGINT NOT NULL,
+                    nb_lignes INTEGER NOT NULL,
+                    valide_utc TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+                )
+            """))
+        return self
+
+    def charger(self):
+        debut = time.perf_counter()
+        with self.engine.connect() as conn:
+            connues = set(conn.execute(text(f"SELECT empreinte FROM {self.table}")).scalars())
+        with self.verrou:
+            self.connues = connues
+        logging.info(f"📒 Journal {self.table} : {len(connues)} fichiers déjà ingérés ({time.perf_counter() - debut:.2f}s)")
+        return self
+
+    def reserver(self, empreinte, chemin):
+        """"nouveau" (réservé pour ce fichier), "connu" (déjà validé) ou "en_cours" (contenu identique en vol)"""
+        with self.verrou:
+            if empreinte in self.connues:
+                return "connu"
+            if empreinte in self.reservees:
+                attente = self.en_attente.setdefault(empreinte, [])
+                if chemin not in attente:
+                    attente.append(chemin)
+                return "en_cours"
+            self.reservees.add(empreinte)
+            return "nouveau"
+
+    def enregistrer(self, conn, elements):
+        """Inscrit les fichiers dans la transaction de leurs lignes : données et journal sont validés ensemble"""
+        entrees = pl.DataFrame(
+            [{"empreinte": e, "fichier": os.path.basename(c), "taille": t, "nb_lignes": df.height}
+             for c, df, e, t in elements if e is not None],
+            schema={"empreinte": pl.Utf8, "fichier": pl.Utf8, "taille": pl.Int64, "nb_lignes": pl.Int32},
+        )
+        if entrees.height:
+            chargement.copier(conn, entrees, self.table)
+
+    def confirmer(self, empreintes):
+        """Empreintes validées en base ; renvoie les fichiers identiques restés en attente, à archiver"""
+        with self.verrou:
+            self.connues.update(empreintes)
+            self.reservees.difference_update(empreintes)
+            return [chemin for e in empreintes for chemin in self.en_attente.pop(e, [])]
+
+    def liberer(self, empreintes):
+        """Empreintes non validées : les fichiers identiques en attente seront repris au prochain démarrage"""
+        with self.verrou:
+            self.reservees.difference_update(empreintes)
+            for e in empreintes:
+                self.en_attente.pop(e, None)
+
+
+class Ingesteur:
+    """Regroupe les fichiers analysés en micro-lots écrits par COPY : un commit par micro-lot, puis archivage"""
+
+    def __init__(self, engine, dossier_archive, table="joconde", constantes=None,
+                 nb_lignes_max=NB_LIGNES_MAX, delai_max_ms=DELAI_MAX_MS, taille_file=TAILLE_FILE, a_la_fin=None, journal=None):
+        self.engine, self.dossier_archive, self.table, self.constantes = engine, dossier_archive, table, constantes
+        self.journal = journal
+        # Appelé pour chaque fichier une fois son sort réglé : a_la_fin(chemin, archive)
+        self.a_la_fin = a_la_fin
+        self.nb_lignes_max, self.delai_max = nb_lignes_max, delai_max_ms / 1000
+        self.file = queue.Queue(maxsize=taille_file)
+        # Budget des envois COPY appris d'un micro-lot à l'autre
+        self.ajusteur = chargement.Ajusteur()
+        # Compteurs mis à jour par l'écrivain et par les threads du répartiteur : toujours sous verrou
+        self.statistiques = {"fichiers": 0, "lignes": 0, "micro_lots": 0, "echecs": 0, "doublons": 0}
+        self.verrou_statistiques = threading.Lock()
+        self._thread = threading.Thread(target=self._ecrire_en_continu, name="ingesteur", daemon=True)
+
+    def demarrer(self):
+        self._thread.start()
+        return self
+
+    def soumettre(self, chemin, df, empreinte=None, taille=None):
+        """Confie les lignes d'un fichier à l'écrivain ; bloque tant que la file est pleine"""
+        self.file.put((chemin, df, empreinte, taille))
+
+    def compter(self, **increments):
+        with self.verrou_statistiques:
+            for cle, valeur in increments.items():
+                self.statistiques[cle] += valeur
+
+    def bilan(self):
+        """Copie cohérente des compteurs"""
+        with self.verrou_statistiques:
+            return dict(self.statistiques)
+
+    def arreter(self):
+        """Écrit ce qui reste en attente puis arrête l'écrivain"""
+        self.file.put(_FIN)
+        self._thread.join()
+        logging.info(f"📊 Ingestion : {self.bilan()}")
+
+    def _ecrire_en_continu(self):
+        en_attente, nb_lignes, echeance, fin = [], 0, None, False
+        while not fin:
+            # Rien en attente : on dort jusqu'au prochain fichier ; sinon jusqu'à l'échéance du micro-lot
+            delai = None if echeance is None else max(0.0, echeance - time.monotonic())
+            try:
+                element = self.file.get(timeout=delai)
+            except queue.Empty:
+                element = None
+            if element is _FIN:
+                fin = True
+            elif element is not None:
+                en_attente.append(element)
+                nb_lignes += element[1].height
+                echeance = echeance or time.monotonic() + self.delai_max
+            if en_attente and (fin or nb_lignes >= self.nb_lignes_max or time.monotonic() >= echeance):
+                self._ecrire(en_attente)
+                en_attente, nb_lignes, echeance = [], 0, None
+
+    def _valider(self, elements):
+        """Écrit les lignes des fichiers en une transaction (un seul COPY pour tout le micro-lot) ;
+        renvoie les fichiers identiques en attente de cette validation"""
+        lots = [df for _, df, _, _ in elements if df.height]
+        with self.engine.begin() as conn:
+            if lots:
+                chargement.copier(conn, pl.concat(lots, how="vertical_relaxed"), self.table, self.constantes, self.ajusteur)
+            if self.journal:
+                self.journal.enregistrer(conn, elements)
+        if not self.journal:
+            return []
+        return self.journal.confirmer([e for _, _, e, _ in elements if e is not None])
+
+    def _ecrire(self, elements):
+        debut = time.perf_counter()
+        try:
+            doublons = self._valider(elements)
+            valides = elements
+        except Exception:
+            # Un fichier défectueux ne doit pas bloquer les autres : reprise fichier par fichier
+            logging.exception(f"❌ Échec du micro-lot de {len(elements)} fichiers : reprise fichier par fichier")
+            valides, doublons = [], []
+            for element in elements:
+                try:
+                    doublons += self._valider([element])
+                    valides.append(element)
+                except Exception:
+                    self.compter(echecs=1)
+                    logging.exception(f"❌ {element[0]} non chargé : laissé dans le dossier d'entrée")
+
+        archives = {chemin for chemin, *_ in valides}
+        if self.journal:
+            # Contenus non validés : ils pourront être repris
+            self.journal.liberer([e for c, _, e, _ in elements if e is not None and c not in archives])
+        # Seuls les fichiers dont les lignes sont validées quittent le dossier d'entrée
+        for chemin in archives:
+            try:
+                archiver(chemin, self.dossier_archive)
+            except OSError:
+                logging.exception(f"❌ Archivage de {chemin} impossible")
+        # Fichiers au contenu identique arrivés pendant l'écriture : déjà chargés, archivés seuls
+        for chemin in doublons:
+            try:
+                archiver(chemin, self.dossier_archive)
+                self.compter(doublons=1)
+            except OSError:
+                logging.exception(f"❌ Archivage de {chemin} impossible")
+        if self.a_la_fin:
+            for chemin, *_ in elements:
+                self.a_la_fin(chemin, chemin in archives)
+        nb_lignes = sum(df.height for _, df, _, _ in valides)
+        self.compter(fichiers=len(valides), lignes=nb_lignes, micro_lots=1)
+        duree = time.perf_counter() - debut
+        logging.info(f"💾 Micro-lot : {nb_lignes} lignes de {len(valides)} fichiers validées et archivées en {duree * 1000:.0f} ms")
+
+
+class Repartiteur:
+    """Analyse les fichiers prêts sur un pool (threads ou processus) et transmet leurs lignes à l'ingesteur"""
+
+    def __init__(self, ingesteur, nb_workers=NB_WORKERS, processus=False, fichiers_en_cours=FICHIERS_EN_COURS):
+        self.ingesteur = ingesteur
+        ingesteur.a_la_fin = self._terminer
+        self.pool = (
+            ProcessPoolExecutor(nb_workers, mp_context=multiprocessing.get_context("spawn"))
+            if processus else ThreadPoolExecutor(nb_workers, thread_name_prefix="analyse")
+        )
+        # Contre-pression : au-delà de `fichiers_en_cours` fichiers non archivés, soumettre() attend
+        self.places = threading.BoundedSemaphore(fichiers_en_cours)
+        self.en_cours = set()
+        self.verrou = threading.Lock()
+        self.termine = threading.Condition(self.verrou)
+
+    def soumettre(self, chemin):
+        """Confie un fichier complet au pool ; ignoré s'il est déjà en cours de traitement"""
+        # Chemin absolu : un même fichier vu par le rattrapage et par un événement n'est traité qu'une fois
+        chemin = os.path.abspath(chemin)
+        with self.verrou:
+            if chemin in self.en_cours:
+                return False
+            self.en_cours.add(chemin)
+        self.places.acquire()
+        try:
+            with open(chemin, "rb") as f:
+                contenu = f.read()
+        except FileNotFoundError:
+            # Fichier archivé entre l'événement et l'obtention d'une place (doublon tardif)
+            self._terminer(chemin, False)
+            return False
+
+        empreinte = None
+        journal = self.ingesteur.journal
+        if journal:
+            # Contrôle en O(1) sur l'index du journal, avant toute analyse
+            empreinte = empreinte_contenu(contenu)
+            etat = journal.reserver(empreinte, chemin)
+            if etat == "connu":
+                # Données déjà validées (ex. arrêt entre le commit et l'archivage) : archivage seul
+                try:
+                    archiver(chemin, self.ingesteur.dossier_archive)
+                except OSError:
+                    logging.exception(f"❌ Archivage de {chemin} impossible")
+                self.ingesteur.compter(doublons=1)
+                logging.info(f"♻️  {chemin} déjà ingéré : archivé sans rechargement")
+                self._terminer(chemin, True)
+                return False
+            if etat == "en_cours":
+                # Même contenu en cours d'écriture : archivé comme doublon dès que celui-ci est validé
+                logging.info(f"⏳ {chemin} : contenu identique en cours d'écriture, archivé après sa validation")
+                self._terminer(chemin, False)
+                return False
+
+        futur = self.pool.submit(analyser, contenu, chemin)
+        futur.add_done_callback(lambda futur: self._transmettre(chemin, futur, empreinte, len(contenu)))
+        return True
+
+    def _transmettre(self, chemin, futur, empreinte=None, taille=None):
+        try:
+            self.ingesteur.soumettre(chemin, futur.result(), empreinte, taille)
+        except Exception:
+            logging.exception(f"❌ Analyse de {chemin} impossible : laissé dans le dossier d'entrée")
+            if empreinte is not None:
+                self.ingesteur.journal.liberer([empreinte])
+            self._terminer(chemin, False)
+
+    def _terminer(self, chemin, archive):
+        with self.verrou:
+            self.en_cours.discard(chemin)
+            self.termine.notify_all()
+        self.places.release()
+
+    def attendre(self, chemins):
+        """Attend que les fichiers `chemins` soient archivés ou écartés (les autres peuvent continuer d'arriver)"""
+        chemins = {os.path.abspath(chemin) for chemin in chemins}
+        with self.termine:
+            self.termine.wait_for(lambda: self.en_cours.isdisjoint(chemins))
+
+    def arreter(self):
+        self.pool.shutdown(wait=True)
+
+
+class Detecteur:
+    """Transmet un fichier au répartiteur dès qu'il est complet : témoin, renommage ou taille/date stables"""
+
+    def __init__(self, repartiteur, stabilite_ms=STABILITE_MS, intervalle_ms=INTERVALLE_MS):
+        self.repartiteur = repartiteur
+        self.stabilite, self.intervalle = stabilite_ms / 1000, intervalle_ms / 1000
+        self.candidats = {}  # chemin -> ((taille, date), instant du dernier changement constaté)
+        self.verrou = threading.Lock()
+        self.arret = threading.Event()
+        self._thread = threading.Thread(target=self._surveiller, name="detecteur", daemon=True)
+
+    def demarrer(self):
+        self._thread.start()
+        return self
+
+    def signaler(self, chemin):
+        """Fichier créé ou modifié : suivi jusqu'à ce qu'il soit complet"""
+        chemin = os.path.abspath(chemin)
+        if os.path.exists(chemin + MARQUEUR):
+            return self.pret(chemin)
+        with self.verrou:
+            self.candidats.setdefault(chemin, (None, time.monotonic()))
+
+    def pret(self, chemin):
+        """Fichier complet (témoin déposé ou renommé à sa place définitive) : transmis sans attendre"""
+        chemin = os.path.abspath(chemin)
+        with self.verrou:
+            self.candidats.pop(chemin, None)
+        if os.path.exists(chemin):
+            self.repartiteur.soumettre(chemin)
+
+    def _surveiller(self):
+        while not self.arret.wait(self.intervalle):
+            with self.verrou:
+                candidats = list(self.candidats.items())
+            for chemin, (signature, depuis) in candidats:
+                try:
+                    etat = os.stat(chemin)
+                except FileNotFoundError:
+                    with self.verrou:
+                        self.candidats.pop(chemin, None)
+                    continue
+                nouvelle = (etat.st_size, etat.st_mtime_ns)
+                maintenant = time.monotonic()
+                if os.path.exists(chemin + MARQUEUR) or (
+                    nouvelle == signature and etat.st_size and maintenant - depuis >= self.stabilite
+                ):
+                    self.pret(chemin)
+                elif nouvelle != signature:
+                    with self.verrou:
+                        if chemin in self.candidats:
+                            self.candidats[chemin] = (nouvelle, maintenant)
+
+    def arreter(self):
+        self.arret.set()
+        self._thread.join()
+
+
+def rattraper(dossier, detecteur, ordre="nom"):
+    """Transmet les fichiers déjà présents au démarrage, dans l'ordre des noms ou des dates de modification"""
+    fichiers = []
+    for entree in os.scandir(dossier):
+        if entree.is_file() and entree.name.endswith(".json"):
+            try:
+                fichiers.append((entree.name, entree.stat().st_mtime_ns, entree.path))
+            except FileNotFoundError:
+                continue  # déjà archivé (événement traité entre-temps)
+    fichiers.sort(key=(lambda f: f[0]) if ordre == "nom" else (lambda f: (f[1], f[0])))
+    logging.info(f"⏪ Rattrapage : {len(fichiers)} fichiers en attente dans {dossier}")
+    debut = time.perf_counter()
+    # Un fichier inchangé depuis plus longtemps que le délai de stabilité est complet ; les autres sont suivis
+    limite_ns = time.time_ns() - int(detecteur.stabilite * 1e9)
+    soumis = []
+    for _, date_ns, chemin in fichiers:
+        if date_ns < limite_ns:
+            detecteur.pret(chemin)
+            soumis.append(chemin)
+        else:
+            detecteur.signaler(chemin)
+    # Seuls les fichiers du rattrapage sont attendus : les dépôts au fil de l'eau ne retardent pas la fin
+    detecteur.repartiteur.attendre(soumis)
+    duree = time.perf_counter() - debut
+    logging.info(f"⏩ Rattrapage terminé : {len(fichiers)} fichiers en {duree:.1f}s ({len(fichiers) / max(duree, 1e-6):,.0f} fichiers/s)")
+    return len(fichiers)
+
+
+# Fichiers du générateur de charge : joconde_<session>_<écrivain>_<numéro>_<création en ns>.json
+MOTIF_CREATION = r"_(\d{16,20})\.json$"
+
+
+def nom_fichier(session, ecrivain, numero, cree_ns):
+    """Nom d'un fichier généré, qui porte sa date de création (relue par rapport_latence via le journal)"""
+    return f"joconde_{session}_{ecrivain:02d}_{numero:06d}_{cree_ns}.json"
+
+
+def ecart_horloge(conn, mesures=5):
+    """Avance de l'horloge du serveur sur l'horloge locale (µs) et incertitude : mesure au plus court aller-retour"""
+    meilleure = None
+    for _ in range(mesures):
+        avant = time.time_ns() // 1000
+        serveur = conn.execute(text("SELECT CAST(EXTRACT(EPOCH FROM clock_timestamp()) * 1000000 AS BIGINT)")).scalar()
+        apres = time.time_ns() // 1000
+        if meilleure is None or apres - avant < meilleure[1] * 2:
+            meilleure = (serveur - (avant + apres) // 2, (apres - avant) // 2)
+    return meilleure
+
+
+def _echapper_like(valeur):
+    return valeur.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def rapport_latence(engine, session=None, table=TABLE_JOURNAL):
+    """Latence création -> validation en base (p50/p95/p99) et débit soutenu, d'après les horodatages du journal"""
+    # Le nom du fichier porte l'horloge de l'écrivain, valide_utc celle du serveur PostgreSQL : l'écart entre
+    # les deux, mesuré depuis cette machine, est retiré des dates de validation (rapport lancé sur la machine
+    # du générateur de charge)
+    motif = _echapper_like(f"joconde_{session}_" if session else "joconde_") + "%"
+    with engine.connect() as conn:
+        ecart_us, incertitude_us = ecart_horloge(conn)
+        lignes = conn.execute(text(f"""
+            SELECT fichier, nb_lignes, CAST(EXTRACT(EPOCH FROM valide_utc) * 1000000 AS BIGINT)
+            FROM {table} WHERE fichier LIKE :motif ESCAPE '\\'
+        """), {"motif": motif}).fetchall()
+    df = pl.DataFrame(
+        [tuple(ligne) for ligne in lignes],
+        schema={"fichier": pl.Utf8, "nb_lignes": pl.Int64, "valide_us": pl.Int64},
+        orient="row",
+    ).with_columns(
+        (pl.col("fichier").str.extract(MOTIF_CREATION, 1).cast(pl.Int64) // 1000).alias("cree_us"),
+        (pl.col("valide_us") - ecart_us).alias("valide_us"),
+    ).drop_nulls("cree_us")
+    if df.is_empty():
+        logging.warning(f"⚠️  Aucun fichier généré dans {table}" + (f" pour la session {session}" if session else ""))
+        return None
+
+    df = df.with_columns(((pl.col("valide_us") - pl.col("cree_us")) / 1000).alias("latence_ms"))
+    latence = df.select(
+        [pl.col("latence_ms").quantile(q, "linear").alias(f"p{int(q * 100)}") for q in (0.5, 0.95, 0.99)]
+        + [pl.col("latence_ms").max().alias("max")]
+    ).row(0, named=True)
+    # Débit soutenu : du premier fichier créé au dernier commit, puis seconde par seconde (hors secondes partielles)
+    fenetre = max((df["valide_us"].max() - df["cree_us"].min()) / 1e6, 1e-6)
+    secondes = df.group_by((pl.col("valide_us") // 1_000_000).alias("seconde")).agg(pl.col("nb_lignes").sum())
+    # Les secondes sans aucun commit comptent pour zéro
+    par_seconde = (
+        pl.DataFrame({"seconde": pl.int_range(secondes["seconde"].min(), secondes["seconde"].max() + 1, eager=True)})
+        .join(secondes, on="seconde", how="left")
+        .fill_null(0)
+        .sort("seconde")["nb_lignes"]
+    )
+    par_seconde = par_seconde[1:-1] if par_seconde.len() > 2 else par_seconde
+    resume = {
+        "fichiers": df.height,
+        "lignes": df["nb_lignes"].sum(),
+        "fichiers_s": df.height / fenetre,
+        "lignes_s": df["nb_lignes"].sum() / fenetre,
+        "lignes_s_p50": par_seconde.median(),
+        "lignes_s_min": par_seconde.min(),
+        "ecart_horloge_ms": ecart_us / 1000,
+        "incertitude_horloge_ms": incertitude_us / 1000,
+        **{f"latence_{cle}_ms": valeur for cle, valeur in latence.items()},
+    }
+    logging.info(
+        f"📈 {resume['fichiers']} fichiers, {resume['lignes']} lignes en {fenetre:.1f}s : "
+        f"{resume['fichiers_s']:,.1f} fichiers/s, {resume['lignes_s']:,.0f} lignes/s "
+        f"(par seconde : médiane {resume['lignes_s_p50']:,.0f}, minimum {resume['lignes_s_min']:,.0f}) ; "
+        f"latence p50 {latence['p50']:.0f} ms, p95 {latence['p95']:.0f} ms, p99 {latence['p99']:.0f} ms, max {latence['max']:.0f} ms "
+        f"(horloge du serveur corrigée de {ecart_us / 1000:+.1f} ms ± {incertitude_us / 1000:.1f} ms)"
+    )
+    return resume
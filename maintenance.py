@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+import chargement
+
+# Mémoire des reconstructions (maintenance_work_mem), répartie entre les constructions simultanées
+BUDGET_MEMOIRE_MO = 1024
+MEMOIRE_MIN_MO = 64
+NB_CONSTRUCTIONS = 4         # index construits en même temps (chacun sur sa connexion)
+NB_WORKERS_PAR_INDEX = 2     # max_parallel_maintenance_workers de chaque construction (B-tree)
+
+
+def definitions(conn, table):
+    """Index et contraintes de `table`, tels que le catalogue permet de les recréer"""
+    parametres = {"table": ".".join(chargement._nom_qualifie(table))}
+    return {
+        # Index qui ne portent pas une contrainte
+        "index": [list(ligne) for ligne in conn.execute(text("""
+            SELECT c.relname, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = CAST(:table AS regclass)
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+            ORDER BY c.relname
+        """), parametres)],
+        # Clés primaires/uniques (avec leur index), exclusions et clés étrangères sortantes.
+        # Une clé référencée par une clé étrangère d'une autre table est conservée pendant le chargement
+        "contraintes": [list(ligne) for ligne in conn.execute(text("""
+            SELECT k.conname, k.contype, pg_get_constraintdef(k.oid),
+                   CASE WHEN k.contype IN ('p', 'u') THEN pg_get_indexdef(k.conindid) END,
+                   EXISTS (
+                       SELECT 1 FROM pg_constraint r
+                       WHERE r.contype = 'f' AND r.confrelid = k.conrelid AND r.conindid = k.conindid
+                         AND r.conrelid <> k.conrelid
+                   )
+            FROM pg_constraint k
+            WHERE k.conrelid = CAST(:table AS regclass) AND k.contype IN ('p', 'u', 'x', 'f')
+            ORDER BY k.conname
+        """), parametres)],
+    }
+
+
+def _nom_index(definition_index):
+    """Nom de l'index dans "CREATE [UNIQUE] INDEX nom ON ..." """
+    return definition_index.split(" INDEX ", 1)[1].split(" ON ", 1)[0]
+
+
+def _a_supprimer(definitions_table):
+    contraintes = [c for c in definitions_table["contraintes"] if not c[4]]
+    return contraintes, definitions_table["index"]
+
+
+def supprimer(engine, table, definitions_table):
+    """Supprime les index et contraintes non indispensables au chargement (une transaction)"""
+    contraintes, index = _a_supprimer(definitions_table)
+    schema, _ = chargement._nom_qualifie(table)
+    with engine.begin() as conn:
+        # Clés étrangères d'abord : elles peuvent s'appuyer sur l'index d'une clé de la même table
+        for nom, type_contrainte, *_ in sorted(contraintes, key=lambda c: c[1] != "f"):
+            conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{nom}"'))
+        for nom, _ in index:
+            conn.execute(text(f'DROP INDEX IF EXISTS {schema}."{nom}"'))
+    logging.info(f"🧹 {table} : {len(contraintes)} contraintes et {len(index)} index supprimés avant chargement")
+
+
+def memoire_maintenance(conn, table, nb_constructions=NB_CONSTRUCTIONS, budget_mo=BUDGET_MEMOIRE_MO):
+    """maintenance_work_mem (Mo) d'une construction : la table doit pouvoir être triée en mémoire, dans le budget"""
+    taille_mo = conn.execute(text("SELECT pg_table_size(CAST(:table AS regclass))"), {"table": table}).scalar() / 1024**2
+    part_mo = budget_mo // max(nb_constructions, 1)
+    return int(max(MEMOIRE_MIN_MO, min(part_mo, taille_mo * 1.2)))
+
+
+def _reglages(conn, memoire_mo, nb_workers):
+    conn.execute(text(f"SET LOCAL maintenance_work_mem = '{int(memoire_mo)}MB'"))
+    conn.execute(text(f"SET LOCAL max_parallel_maintenance_workers = {int(nb_workers)}"))
+
+
+def _existants(conn, table):
+    schema, _ = chargement._nom_qualifie(table)
+    index = set(conn.execute(text("""
+        SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relkind IN ('i', 'I')
+    """), {"schema": schema}).scalars())
+    contraintes = set(conn.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass)"
+    ), {"table": table}).scalars())
+    return index, contraintes
+
+
+def reconstruire(engine, table, definitions_table, nb_constructions=NB_CONSTRUCTIONS,
+                 budget_mo=BUDGET_MEMOIRE_MO, nb_workers=NB_WORKERS_PAR_INDEX):
+    """Recrée les index et contraintes supprimés (ceux qui existent déjà sont ignorés)"""
+    contraintes, index = _a_supprimer(definitions_table)
+    with engine.begin() as conn:
+        memoire_mo = memoire_maintenance(conn, table, nb_constructions, budget_mo)
+        index_existants, contraintes_existantes = _existants(conn, table)
+    cles = [c for c in contraintes if c[1] in ("p", "u") and c[0] not in contraintes_existantes]
+
+    # 1. Index B-tree (ceux des clés compris) construits en parallèle : CREATE INDEX ne prend qu'un verrou SHARE,
+    #    compatible avec les autres constructions sur la même table
+    a_construire = [definition for nom, definition in index if nom not in index_existants]
+    a_construire += [d for _, _, _, d, _ in cles if _nom_index(d).strip('"') not in index_existants]
+
+    def construire(definition):
+        debut = time.perf_counter()
+        with engine.begin() as conn:
+            _reglages(conn, memoire_mo, nb_workers)
+            # Définition issue du catalogue, exécutée telle quelle
+            conn.exec_driver_sql(definition)
+        logging.info(f"🏗️  {definition} ({time.perf_counter() - debut:.1f}s)")
+
+    if a_construire:
+        logging.info(f"🏗️  {len(a_construire)} index à construire sur {min(nb_constructions, len(a_construire))} connexions "
+                     f"(maintenance_work_mem {memoire_mo} Mo, {nb_workers} workers par index)")
+        with ThreadPoolExecutor(max_workers=max(1, min(nb_constructions, len(a_construire)))) as pool:
+            list(pool.map(construire, a_construire))
+
+    with engine.begin() as conn:
+        # Constructions séquentielles : tout le budget pour chacune
+        _reglages(conn, memoire_maintenance(conn, table, 1, budget_mo), nb_workers)
+        # 2. Clés primaires et uniques rattachées à leur index fraîchement construit (instantané)
+        for nom, type_contrainte, definition, definition_index, _ in cles:
+            nom_index = _nom_index(definition_index)
+            options = " DEFERRABLE" if "DEFERRABLE" in definition and "NOT DEFERRABLE" not in definition else ""
+            options += " INITIALLY DEFERRED" if "INITIALLY DEFERRED" in definition else ""
+            mot_cle = "PRIMARY KEY" if type_contrainte == "p" else "UNIQUE"
+            conn.exec_driver_sql(f'ALTER TABLE {table} ADD CONSTRAINT "{nom}" {mot_cle} USING INDEX {nom_index}{options}')
+        # 3. Exclusions (index GiST construit par la contrainte elle-même)
+        for nom, type_contrainte, definition, _, _ in contraintes:
+            if type_contrainte == "x" and nom not in contraintes_existantes:
+                conn.exec_driver_sql(f'ALTER TABLE {table} ADD CONSTRAINT "{nom}" {definition}')
+        # 4. Clés étrangères : ajoutées NOT VALID puis validées en un seul balayage
+        for nom, type_contrainte, definition, _, _ in contraintes:
+            if type_contrainte == "f" and nom not in contraintes_existantes:
+                conn.exec_driver_sql(f'ALTER TABLE {table} ADD CONSTRAINT "{nom}" {definition.replace(" NOT VALID", "")} NOT VALID')
+                conn.execute(text(f'ALTER TABLE {table} VALIDATE CONSTRAINT "{nom}"'))
+    logging.info(f"✅ {table} : index et contraintes reconstruits")
+
+
+def verifier(engine, table, definitions_table):
+    """Compare index et contraintes au relevé d'avant chargement, vérifie leur validité et met à jour les statistiques"""
+    with engine.begin() as conn:
+        apres = definitions(conn, table)
+        invalides = conn.execute(text("""
+            SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = CAST(:table AS regclass) AND NOT (i.indisvalid AND i.indisready)
+        """), {"table": table}).scalars().all()
+        non_validees = conn.execute(text("""
+            SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND NOT convalidated
+        """), {"table": table}).scalars().all()
+        conn.execute(text(f"ANALYZE {table}"))
+        nb_lignes = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+    manquants = [d[0] for d in definitions_table["index"] if d not in apres["index"]]
+    manquants += [c[0] for c in definitions_table["contraintes"] if c[:3] not in [a[:3] for a in apres["contraintes"]]]
+    if manquants or invalides or non_validees:
+        raise RuntimeError(
+            f"{table} : index/contraintes manquants ou différents {manquants}, index invalides {invalides}, "
+            f"contraintes non validées {non_validees}"
+        )
+    logging.info(f"🔍 {table} : {nb_lignes:,} lignes, {len(apres['index'])} index et "
+                 f"{len(apres['contraintes'])} contraintes conformes au relevé d'avant chargement")
+    return nb_lignes
+
+
+def charger_sans_index(engine, table, charger, sauvegarde=None, **reglages):
+    """Relève index et contraintes, les supprime, exécute `charger()`, les reconstruit puis vérifie la table"""
+    sauvegarde = sauvegarde or f"definitions_{table.replace('.', '_')}.json"
+    if os.path.exists(sauvegarde):
+        # Chargement précédent interrompu : la table est d'abord remise dans son état complet
+        with open(sauvegarde, encoding="utf-8") as f:
+            definitions_table = json.load(f)
+        logging.warning(f"⚠️  Relevé {sauvegarde} trouvé : reconstruction des objets d'un chargement interrompu")
+        reconstruire(engine, table, definitions_table, **reglages)
+    else:
+        with engine.begin() as conn:
+            definitions_table = definitions(conn, table)
+        # Relevé sur disque avant toute suppression : rien n'est perdu si le processus s'arrête en route
+        temporaire = f"{sauvegarde}.{os.getpid()}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(definitions_table, f, ensure_ascii=False, indent=2)
+        os.replace(temporaire, sauvegarde)
+
+    supprimer(engine, table, definitions_table)
+    try:
+        resultat = charger()
+    finally:
+        # Même en cas d'échec du chargement, la table retrouve ses index et contraintes
+        reconstruire(engine, table, definitions_table, **reglages)
+    verifier(engine, table, definitions_table)
+    os.remove(sauvegarde)
+    return resultat
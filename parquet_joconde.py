@@ -0,0 +1,214 @@
+import glob
+import logging
+import os
+import shutil
+import time
+import urllib.parse
+import polars as pl
+import pyarrow.parquet as pq
+import extraction
+
+# Réglages par défaut du convertisseur (surchargeables par la section `parquet` de config.yaml)
+REGLAGES = {
+    "compression": "zstd",    # snappy, zstd, lz4, gzip, brotli ou none
+    "niveau": 3,              # niveau de compression (zstd, gzip, brotli) ; ignoré par snappy et lz4
+    "taille_groupe": 131_072, # lignes par row group : unité de lecture et d'élagage par statistiques
+    "dictionnaire": True,     # encodage dictionnaire des pages (efficace sur region, ville...)
+    "statistiques": True,     # min/max par row group, nécessaires au filtrage des scans
+}
+
+# Matrice de réglages comparés par benchmark()
+MATRICE = [
+    {"compression": "snappy", "niveau": None},
+    {"compression": "lz4", "niveau": None},
+    {"compression": "zstd", "niveau": 1},
+    {"compression": "zstd", "niveau": 3},
+    {"compression": "zstd", "niveau": 9},
+    {"compression": "zstd", "niveau": 3, "dictionnaire": False},
+    {"compression": "zstd", "niveau": 3, "taille_groupe": 16_384},
+    {"compression": "zstd", "niveau": 3, "taille_groupe": 1_048_576},
+    {"compression": "none", "niveau": None},
+]
+
+_SANS_NIVEAU = {"snappy", "lz4", "none"}
+
+# Jeu de données partitionné façon Hive : dossier/region=…/departement=…/part-0.parquet
+PARTITIONS = ("region", "departement")
+VALEUR_NULLE = "__HIVE_DEFAULT_PARTITION__"
+
+
+def ecrire_parquet(lots, chemin, compression="zstd", niveau=3, taille_groupe=131_072, dictionnaire=True, statistiques=True):
+    """Écrit des lots (DataFrame Polars) dans un fichier Parquet au fil de l'eau et retourne le nombre de lignes"""
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    writer, tampon, en_attente, total = None, [], 0, 0
+    try:
+        for lot in lots:
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    temporaire,
+                    lot.to_arrow().schema,
+                    compression=compression,
+                    compression_level=None if compression in _SANS_NIVEAU else niveau,
+                    use_dictionary=dictionnaire,
+                    write_statistics=statistiques,
+                )
+            tampon.append(lot)
+            en_attente += lot.height
+            # Row groups de taille fixe, indépendante de la taille des lots reçus
+            while en_attente >= taille_groupe:
+                bloc = pl.concat(tampon, rechunk=False)
+                writer.write_table(bloc.slice(0, taille_groupe).to_arrow(), row_group_size=taille_groupe)
+                tampon, en_attente = [bloc.slice(taille_groupe)], en_attente - taille_groupe
+                total += taille_groupe
+        if writer is None:
+            raise ValueError(f"{chemin} : aucun lot à écrire")
+        if en_attente:
+            writer.write_table(pl.concat(tampon, rechunk=False).to_arrow(), row_group_size=taille_groupe)
+            total += en_attente
+        writer.close()
+        writer = None
+        os.replace(temporaire, chemin)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+    return total
+
+
+def convertir(source, chemin, colonnes=None, **reglages):
+    """Convertit l'export Joconde (JSON ou CSV) en Parquet sans le charger entièrement en mémoire"""
+    reglages = {**REGLAGES, **reglages}
+    lots = extraction.lire_par_lots(source)
+    if colonnes:
+        lots = (lot.select(colonnes) for lot in lots)
+    nb_lignes = ecrire_parquet(lots, chemin, **reglages)
+    logging.info(f"💾 {nb_lignes:,} lignes écrites dans {chemin} ({reglages})")
+    return nb_lignes
+
+
+def encoder_partition(valeur):
+    """Valeur de partition utilisable comme nom de dossier ("/", "=", accents... encodés en %XX)"""
+    return VALEUR_NULLE if valeur is None else urllib.parse.quote(str(valeur), safe="")
+
+
+def decoder_partition(valeur):
+    return None if valeur == VALEUR_NULLE else urllib.parse.unquote(valeur)
+
+
+def ecrire_dataset(df, dossier, partitions=PARTITIONS, **reglages):
+    """Écrit un jeu de données Parquet partitionné (un fichier par combinaison de valeurs des partitions)"""
+    reglages = {**REGLAGES, **reglages}
+    partitions = list(partitions)
+    temporaire = f"{dossier.rstrip(os.sep)}.{os.getpid()}.tmp"
+    if os.path.exists(temporaire):
+        shutil.rmtree(temporaire)
+
+    morceaux = df.partition_by(partitions, as_dict=True, include_key=False, maintain_order=False)
+    for cle, morceau in morceaux.items():
+        cle = cle if isinstance(cle, tuple) else (cle,)
+        chemin = os.path.join(temporaire, *(f"{nom}={encoder_partition(v)}" for nom, v in zip(partitions, cle)))
+        os.makedirs(chemin, exist_ok=True)
+        ecrire_parquet([morceau], os.path.join(chemin, "part-0.parquet"), **reglages)
+
+    # Remplacement du jeu précédent d'un bloc : un lecteur ne voit jamais un jeu à moitié écrit
+    ancien = f"{dossier.rstrip(os.sep)}.{os.getpid()}.ancien"
+    if os.path.exists(dossier):
+        os.replace(dossier, ancien)
+    os.replace(temporaire, dossier)
+    if os.path.exists(ancien):
+        shutil.rmtree(ancien)
+    logging.info(f"🗂️  {df.height:,} lignes écrites dans {len(morceaux)} partitions ({'/'.join(partitions)}) : {dossier}")
+    return len(morceaux)
+
+
+def lister_partitions(dossier, partitions=PARTITIONS):
+    """Table des partitions du jeu de données : une ligne par fichier, valeurs décodées (texte)"""
+    motif = os.path.join(glob.escape(dossier), *(f"{nom}=*" for nom in partitions), "*.parquet")
+    lignes = []
+    for chemin in sorted(glob.glob(motif)):
+        dossiers = os.path.relpath(chemin, dossier).split(os.sep)[:-1]
+        lignes.append({nom: decoder_partition(d.split("=", 1)[1]) for nom, d in zip(partitions, dossiers)} | {"chemin": chemin})
+    schema = {nom: pl.Utf8 for nom in partitions} | {"chemin": pl.Utf8}
+    return pl.DataFrame(lignes, schema=schema)
+
+
+def scanner_dataset(dossier, filtres=(), partitions=PARTITIONS):
+    """Scan paresseux du jeu partitionné : seuls les fichiers des partitions retenues par les filtres sont lus"""
+    filtres = [filtres] if isinstance(filtres, pl.Expr) else list(filtres)
+    table = lister_partitions(dossier, partitions)
+    nb_fichiers = table.height
+    # Les filtres qui ne portent que sur les colonnes de partition s'évaluent sur la table des partitions
+    for filtre in filtres:
+        if set(filtre.meta.root_names()) <= set(partitions):
+            table = table.filter(filtre)
+    logging.info(f"🗂️  {table.height} fichiers retenus sur {nb_fichiers} ({dossier})")
+
+    if table.is_empty():
+        return pl.LazyFrame(schema={nom: pl.Utf8 for nom in partitions})
+    # Colonnes de partition ajoutées en texte : l'inférence de types Hive de Polars lirait "01" en entier et "2A" en texte
+    scans = [
+        pl.scan_parquet(ligne["chemin"], hive_partitioning=False).with_columns(
+            [pl.lit(ligne[nom], dtype=pl.Utf8).alias(nom) for nom in partitions]
+        )
+        for ligne in table.iter_rows(named=True)
+    ]
+    lf = pl.concat(scans, how="diagonal")
+    for filtre in filtres:
+        lf = lf.filter(filtre)
+    return lf
+
+
+def _mesurer(fonction):
+    debut = time.perf_counter()
+    resultat = fonction()
+    return time.perf_counter() - debut, resultat
+
+
+def benchmark(source, dossier, matrice=MATRICE, colonnes_scan=("region", "ville"), taille_lot=extraction.TAILLE_LOT):
+    """Compare les réglages : débit d'écriture et de lecture, taille du fichier, scan élagué (colonnes + filtre)"""
+    df = extraction.charger(source)
+    taille_memoire_mo = df.estimated_size(unit="mb")
+    filtre_valeur = df[colonnes_scan[0]].drop_nulls().head(1).to_list()
+    os.makedirs(dossier, exist_ok=True)
+
+    print(f"📊 {df.height:,} lignes, {taille_memoire_mo:.1f} Mo en mémoire")
+    print(f"{'réglage':40} {'écriture Mo/s':>14} {'lecture Mo/s':>13} {'taille Mo':>10} {'scan élagué s':>14}")
+    resultats = []
+    for reglage in matrice:
+        reglage = {**REGLAGES, **reglage}
+        nom = f"{reglage['compression']}-{reglage['niveau']}-rg{reglage['taille_groupe']}" + ("" if reglage["dictionnaire"] else "-sansdict")
+        chemin = os.path.join(dossier, f"joconde-{nom}.parquet")
+
+        # Lots déjà en mémoire : on ne mesure que l'encodage et la compression
+        lots = (df.slice(offset, taille_lot) for offset in range(0, df.height, taille_lot))
+        duree_ecriture, _ = _mesurer(lambda: ecrire_parquet(lots, chemin, **reglage))
+        duree_lecture, _ = _mesurer(lambda: pl.read_parquet(chemin))
+        scan = pl.scan_parquet(chemin).select(list(colonnes_scan))
+        if filtre_valeur:
+            scan = scan.filter(pl.col(colonnes_scan[0]) == filtre_valeur[0])
+        duree_scan, _ = _mesurer(scan.collect)
+
+        resultat = {
+            "reglage": nom,
+            "ecriture_mo_s": taille_memoire_mo / duree_ecriture,
+            "lecture_mo_s": taille_memoire_mo / duree_lecture,
+            "taille_mo": os.path.getsize(chemin) / (1024**2),
+            "scan_elague_s": duree_scan,
+        }
+        resultats.append(resultat)
+        print(f"{nom:40} {resultat['ecriture_mo_s']:14.1f} {resultat['lecture_mo_s']:13.1f} "
+              f"{resultat['taille_mo']:10.2f} {resultat['scan_elague_s']:14.3f}")
+    return resultats
+
+
+if __name__ == "__main__":
+    import sys
+    import yaml
+
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    # python parquet_joconde.py [dossier_de_sortie]
+    benchmark(config["fichiers"]["source"], sys.argv[1] if len(sys.argv) > 1 else "benchmark_parquet")
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+import polars as pl
+from sqlalchemy import text
+import chargement
+import connexion
+import extraction
+import transformations
+
+try:
+    import asyncpg
+except ImportError:  # puits asyncpg optionnel : le COPY psycopg2 de chargement.py sert par défaut
+    asyncpg = None
+
+# Lots en attente entre deux étapes : la mémoire reste bornée et l'étape rapide attend la plus lente
+TAILLE_FILE = 4
+FIN = None  # marque de fin transmise d'étape en étape
+
+
+@asynccontextmanager
+async def puits_psycopg2(engine, table, constantes=None, vider=True):
+    """Écrit les lots par COPY (chargement.copier) dans une seule transaction, validée en fin de flux"""
+    conn = await asyncio.to_thread(engine.connect)
+    transaction = await asyncio.to_thread(conn.begin)
+    # Budget des envois appris sur le premier lot, conservé pour les suivants
+    ajusteur = chargement.Ajusteur()
+    try:
+        if vider:
+            await asyncio.to_thread(conn.execute, text(f"TRUNCATE TABLE {table}"))
+
+        async def ecrire(lot):
+            return await asyncio.to_thread(chargement.copier, conn, lot, table, constantes, ajusteur)
+
+        yield ecrire
+        await asyncio.to_thread(transaction.commit)
+    except BaseException:
+        await asyncio.to_thread(transaction.rollback)
+        raise
+    finally:
+        await asyncio.to_thread(conn.close)
+
+
+@asynccontextmanager
+async def puits_asyncpg(table, profil="joconde", constantes=None, vider=True):
+    """Écrit les lots par COPY asyncpg (copy_to_table) : l'envoi ne mobilise aucun thread"""
+    if asyncpg is None:
+        raise ImportError("asyncpg n'est pas installé (pip install asyncpg) : utiliser le puits psycopg2")
+    constantes = constantes or {}
+    p = connexion.parametres(profil)
+    conn = await asyncpg.connect(user=p["user"], password=p["password"], host=p["host"], port=int(p["port"]), database=p["db"])
+    schema, _, nom = table.rpartition(".")
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        cibles = [attribut.name for attribut in (await conn.prepare(f"SELECT * FROM {table} LIMIT 0")).get_attributes()]
+        if vider:
+            await conn.execute(f"TRUNCATE TABLE {table}")
+
+        async def ecrire(lot):
+            colonnes = [c for c in lot.columns if c in cibles and c not in constantes]
+            audit = {c: valeur for c, valeur in constantes.items() if c in cibles}
+            morceau = lot.select(colonnes).with_columns([pl.lit(valeur).alias(c) for c, valeur in audit.items()])
+            tampon = await asyncio.to_thread(chargement.encoder_csv, morceau)
+            await conn.copy_to_table(
+                nom, schema_name=schema or None, source=tampon,
+                columns=colonnes + list(audit), format="csv", null="",
+            )
+            return morceau.height
+
+        yield ecrire
+        await transaction.commit()
+    except BaseException:
+        await transaction.rollback()
+        raise
+    finally:
+        await conn.close()
+
+
+async def _extraire(lots, sortie, durees):
+    iterateur = iter(lots)
+    while True:
+        debut = time.perf_counter()
+        # La lecture bloquante tourne dans un thread : la boucle continue de servir les autres étapes
+        lot = await asyncio.to_thread(next, iterateur, FIN)
+        durees["extraction"] += time.perf_counter() - debut
+        # File pleine : l'extraction attend que la transformation suive (contre-pression)
+        await sortie.put(lot)
+        if lot is FIN:
+            return
+
+
+async def _transformer(entree, sortie, transformation, durees):
+    while (lot := await entree.get()) is not FIN:
+        debut = time.perf_counter()
+        # Polars relâche le GIL : la transformation avance pendant la lecture et le COPY
+        resultat = await asyncio.to_thread(transformation, lot)
+        durees["transformation"] += time.perf_counter() - debut
+        await sortie.put(resultat)
+    await sortie.put(FIN)
+
+
+async def _charger(entree, ecrire, durees):
+    total = 0
+    while (lot := await entree.get()) is not FIN:
+        debut = time.perf_counter()
+        total += await ecrire(lot)
+        durees["chargement"] += time.perf_counter() - debut
+    return total
+
+
+async def executer(lots, puits, transformation=transformations.enrichir, taille_file=TAILLE_FILE):
+    """Extraction, transformation et chargement en parallèle, reliés par des files bornées de lots"""
+    bruts, transformes = asyncio.Queue(taille_file), asyncio.Queue(taille_file)
+    durees = {"extraction": 0.0, "transformation": 0.0, "chargement": 0.0}
+    debut = time.perf_counter()
+    # Une étape en échec annule les autres ; le puits annule alors sa transaction
+    async with puits as ecrire:
+        async with asyncio.TaskGroup() as groupe:
+            groupe.create_task(_extraire(lots, bruts, durees))
+            groupe.create_task(_transformer(bruts, transformes, transformation, durees))
+            tache_chargement = groupe.create_task(_charger(transformes, ecrire, durees))
+    total = tache_chargement.result()
+
+    duree = time.perf_counter() - debut
+    detail = ", ".join(f"{etape} {secondes:.2f}s" for etape, secondes in durees.items())
+    logging.info(
+        f"🚀 {total} lignes en {duree:.2f}s ({total / max(duree, 1e-6):,.0f} lignes/s) ; "
+        f"temps actif par étape : {detail} (somme {sum(durees.values()):.2f}s, plus lente {max(durees.values()):.2f}s)"
+    )
+    return total
+
+
+if __name__ == "__main__":
+    import yaml
+
+    with open("config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    reglages = config.get("pipeline", {})
+    table = config["staging"]["table"]
+    constantes = chargement.colonnes_audit(config, horodatage=True)
+    if reglages.get("puits", "psycopg2") == "asyncpg":
+        puits = puits_asyncpg(table, profil="staging", constantes=constantes)
+    else:
+        puits = puits_psycopg2(connexion.moteur_config(config, profil="staging"), table, constantes=constantes)
+
+    lots = extraction.lire_par_lots(config["fichiers"]["source"])
+    asyncio.run(executer(lots, puits, taille_file=reglages.get("taille_file", TAILLE_FILE)))
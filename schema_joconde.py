@@ -0,0 +1,157 @@
+import json
+import logging
+from typing import NamedTuple
+import polars as pl
+
+# À incrémenter à chaque modification de COLONNES (invalide les caches)
+SCHEMA_VERSION = "1"
+
+
+class Colonne(NamedTuple):
+    nom: str
+    dtype: pl.PolarsDataType = pl.Utf8
+    nullable: bool = True
+    liste: bool = False
+
+
+# Notice Joconde telle que publiée (export data.culture.gouv.fr) : tout est texte,
+# les conversions métier (dates, années...) se font dans les transformations
+COLONNES = [
+    Colonne("reference", nullable=False),
+    Colonne("ancien_depot"),
+    Colonne("ancienne_appartenance"),
+    Colonne("appellation"),
+    Colonne("artiste_sous_droits"),
+    Colonne("auteur"),
+    Colonne("precisions_sur_l_auteur"),
+    Colonne("code_museofile"),
+    Colonne("date_creation"),
+    Colonne("date_d_acquisition"),
+    Colonne("date_de_depot"),
+    Colonne("date_de_mise_a_jour"),
+    Colonne("date_entree_dans_le_domaine_public"),
+    Colonne("decouverte_collecte"),
+    Colonne("denomination"),
+    Colonne("departement"),
+    Colonne("description"),
+    Colonne("dimensions"),
+    Colonne("domaine", pl.List(pl.Utf8), liste=True),
+    Colonne("ecole_pays"),
+    Colonne("epoque"),
+    Colonne("exposition"),
+    Colonne("genese"),
+    Colonne("geographie_historique"),
+    Colonne("inscriptions"),
+    Colonne("lieu_de_creation_utilisation"),
+    Colonne("materiaux_techniques", pl.List(pl.Utf8), liste=True),
+    Colonne("millesime_de_creation"),
+    Colonne("millesime_d_utilisation"),
+    Colonne("mode_d_acquisition"),
+    Colonne("nom_officiel_musee"),
+    Colonne("numero_inventaire"),
+    Colonne("onomastique"),
+    Colonne("periode_de_creation"),
+    Colonne("periode_d_utilisation"),
+    Colonne("presence_image"),
+    Colonne("region"),
+    Colonne("source_historique"),
+    Colonne("statut_juridique"),
+    Colonne("sujet_represente"),
+    Colonne("titre"),
+    Colonne("utilisation"),
+    Colonne("ville"),
+]
+
+_derives_signalees = set()
+
+
+def schema_polars():
+    """Schéma Polars {colonne: dtype} dans l'ordre du registre"""
+    return {c.nom: c.dtype for c in COLONNES}
+
+
+def colonnes_liste():
+    return [c.nom for c in COLONNES if c.liste]
+
+
+def detecter_derive(schema_fichier, source=""):
+    """Compare les colonnes (et types si fournis) d'un fichier au registre et signale les écarts"""
+    attendu = schema_polars()
+    if not isinstance(schema_fichier, dict):
+        schema_fichier = {nom: None for nom in schema_fichier}
+
+    derive = {
+        "manquantes": [nom for nom in attendu if nom not in schema_fichier],
+        "inattendues": [nom for nom in schema_fichier if nom not in attendu],
+        "types": {
+            nom: (str(attendu[nom]), str(dtype))
+            for nom, dtype in schema_fichier.items()
+            if nom in attendu and dtype is not None and dtype != attendu[nom]
+        },
+    }
+
+    if derive["manquantes"] or derive["inattendues"] or derive["types"]:
+        signature = (source, tuple(derive["manquantes"]), tuple(derive["inattendues"]), tuple(derive["types"]))
+        if signature not in _derives_signalees:
+            _derives_signalees.add(signature)
+            logging.warning(f"⚠️  Dérive du schéma Joconde v{SCHEMA_VERSION} {source} : {derive}")
+    return derive
+
+
+def normaliser_notice(notice):
+    """Ramène les valeurs d'une notice aux types du registre (listes, texte)"""
+    for c in COLONNES:
+        valeur = notice.get(c.nom)
+        if valeur is None:
+            continue
+        if c.liste:
+            if not isinstance(valeur, list):
+                notice[c.nom] = [str(valeur)]
+            else:
+                notice[c.nom] = [v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for v in valeur]
+        elif isinstance(valeur, list):
+            notice[c.nom] = " ; ".join(v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for v in valeur)
+        elif isinstance(valeur, dict):
+            notice[c.nom] = json.dumps(valeur, ensure_ascii=False)
+    return notice
+
+
+def verifier_nullabilite(df, source=""):
+    """Signale les valeurs nulles dans les colonnes déclarées non nulles"""
+    non_nulles = [c.nom for c in COLONNES if not c.nullable and c.nom in df.columns]
+    if not non_nulles:
+        return {}
+    comptes = df.select(pl.col(non_nulles).null_count()).row(0, named=True)
+    nulles = {nom: n for nom, n in comptes.items() if n}
+    if nulles:
+        logging.warning(f"⚠️  Valeurs nulles dans des colonnes non nulles {source} : {nulles}")
+    return nulles
+
+
+def conformer(df, source="", separateur_liste=None):
+    """Aligne un DataFrame (CSV, IPC, Parquet...) sur le registre : colonnes, ordre et types"""
+    schema_fichier = dict(df.schema)
+    if separateur_liste:
+        # Colonnes multivaluées jointes en texte (CSV) : forme attendue, pas une dérive
+        for nom in colonnes_liste():
+            if schema_fichier.get(nom) == pl.Utf8:
+                schema_fichier[nom] = None
+    detecter_derive(schema_fichier, source)
+
+    expressions = []
+    for c in COLONNES:
+        if c.nom not in df.columns:
+            expressions.append(pl.lit(None, dtype=c.dtype).alias(c.nom))
+        elif df.schema[c.nom] == c.dtype:
+            expressions.append(pl.col(c.nom))
+        elif c.liste and df.schema[c.nom] == pl.Utf8 and separateur_liste:
+            expressions.append(pl.col(c.nom).str.split(separateur_liste).list.eval(pl.element().str.strip_chars()))
+        elif c.liste:
+            expressions.append(
+                pl.when(pl.col(c.nom).is_not_null())
+                .then(pl.concat_list(pl.col(c.nom).cast(pl.Utf8, strict=False)))
+                .alias(c.nom)
+            )
+        else:
+            expressions.append(pl.col(c.nom).cast(c.dtype, strict=False))
+    return df.select(expressions)
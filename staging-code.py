@@ -1,5 +1,8 @@
 import polars as pl
-from sqlalchemy import create_engine, text, Table, Column, MetaData, String, Text, DateTime, insert, delete
+import cache_feather
+import chargement
+import connexion
+from sqlalchemy import text, Table, Column, MetaData, String, Text, DateTime
 from datetime import datetime, timezone
 import logging
 import os
@@ -17,14 +20,8 @@ print("="*80)
 # ============================================================================
 # CONFIGURATION POSTGRESQL
 # ============================================================================
-DB_CONFIG = {
-    'user': 'joconde_import',
-    'password': 'MsacR%GK85.VoykyEU',
-    'host': 'localhost',
-    'port': 5434,
-    'database': 'joconde_staging',
-    'schema': 'staging'
-}
+# Base de staging : profil "staging" de connexion.py (surchargé par les variables POSTGRES_STAGING_*)
+SCHEMA = 'staging'
 
 # Chemins
 fichier_json = '/Users/macbook/Downloads/base-joconde-extrait.json'
@@ -34,11 +31,7 @@ fichier_cache = "/Users/macbook/Downloads/joconde_cache.feather"
 # CONNEXION POSTGRESQL
 # ============================================================================
 print("\n📡 Connexion à PostgreSQL...")
-engine = create_engine(
-    f"postgresql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-    f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}",
-    executemany_mode='values_plus_batch'
-)
+engine = connexion.moteur("staging")
 
 # Test de connexion
 try:
@@ -55,14 +48,10 @@ except Exception as e:
 # ============================================================================
 print("\n📥 Chargement des données Joconde...")
 
-if os.path.exists(fichier_cache):
-    print("📦 Chargement depuis le cache feather...")
-    df = pl.read_ipc(fichier_cache)
-else:
-    print("📥 Chargement depuis le JSON source...")
-    df = pl.read_json(fichier_json, infer_schema_length=None)
-    print("💾 Sauvegarde du cache feather...")
-    df.write_ipc(fichier_cache)
+df = cache_feather.scanner(fichier_json, fichier_cache).select([
+    "reference", "appellation", "auteur", "date_creation", "region", "departement", "description"
+]).collect()
+print(f"📦 Cache feather : {cache_feather.statistiques()}")
 
 print(f"✅ {len(df):,} lignes chargées")
 
@@ -86,14 +75,12 @@ df_staging = df.select([
     pl.lit("etl_batch_python_staging").alias("load_process")
 ])
 
-# Convertir en liste de dictionnaires
-records = df_staging.to_dicts()
-print(f"✅ {len(records):,} enregistrements préparés")
+print(f"✅ {len(df_staging):,} enregistrements préparés")
 
 # ============================================================================
 # DÉFINITION DE LA TABLE SQLALCHEMY
 # ============================================================================
-metadata = MetaData(schema=DB_CONFIG['schema'])
+metadata = MetaData(schema=SCHEMA)
 
 table_joconde = Table(
     'joconde',
@@ -108,32 +95,21 @@ table_joconde = Table(
     Column('load_timestamp_utc', DateTime(timezone=True)),
     Column('source_system', String(50)),
     Column('load_process', String(50)),
-    schema=DB_CONFIG['schema']
+    schema=SCHEMA
 )
 
 # ============================================================================
-# INSERTION EN BASE (PAR LOTS POUR PERFORMANCE)
+# INSERTION EN BASE (COPY)
 # ============================================================================
 print("\n💾 Insertion en base de données...")
 
-BATCH_SIZE = 10000  # Insérer par lots de 10k lignes
-
 try:
-    with engine.begin() as conn:
-        # Vider la table
-        print("🗑️  Suppression des données existantes...")
-        conn.execute(text(f"TRUNCATE TABLE {DB_CONFIG['schema']}.joconde"))
-        
-        # Insérer par lots
-        total_batches = (len(records) + BATCH_SIZE - 1) // BATCH_SIZE
-        print(f"📝 Insertion de {len(records):,} lignes en {total_batches} lots...")
-        
-        for i in range(0, len(records), BATCH_SIZE):
-            batch = records[i:i + BATCH_SIZE]
-            conn.execute(insert(table_joconde), batch)
-            batch_num = (i // BATCH_SIZE) + 1
-            print(f"   ✅ Lot {batch_num}/{total_batches} ({len(batch):,} lignes)")
-        
+    # COPY FROM STDIN en parallèle dans une table fantôme, substituée à la table par renommage
+    print(f"📝 Copie de {len(df_staging):,} lignes sur {chargement.NB_CONNEXIONS} connexions...")
+    chargement.charger_par_bascule(
+        engine, df_staging, f"{SCHEMA}.joconde", nb_connexions=chargement.NB_CONNEXIONS
+    )
+
     print("✅ Données insérées avec succès !")
     
 except Exception as e:
@@ -149,20 +125,20 @@ print("\n🔍 Vérification des données...")
 
 with engine.connect() as conn:
     # Compter les lignes
-    result = conn.execute(text(f"SELECT COUNT(*) FROM {DB_CONFIG['schema']}.joconde"))
+    result = conn.execute(text(f"SELECT COUNT(*) FROM {SCHEMA}.joconde"))
     count = result.fetchone()[0]
     print(f"✅ Nombre de lignes insérées : {count:,}")
     
     # Vérifier que le compte correspond
-    if count == len(records):
+    if count == len(df_staging):
         print("✅ Toutes les lignes ont été insérées correctement")
     else:
-        print(f"⚠️  Attention : {len(records):,} lignes préparées mais {count:,} insérées")
+        print(f"⚠️  Attention : {len(df_staging):,} lignes préparées mais {count:,} insérées")
     
     # Statistiques par région
     result = conn.execute(text(f"""
         SELECT region, COUNT(*) as nb
-        FROM {DB_CONFIG['schema']}.joconde
+        FROM {SCHEMA}.joconde
         WHERE region IS NOT NULL
         GROUP BY region
         ORDER BY nb DESC
@@ -176,7 +152,7 @@ with engine.connect() as conn:
     # Exemple de données
     result = conn.execute(text(f"""
         SELECT reference, appellation, region, load_timestamp_utc
-        FROM {DB_CONFIG['schema']}.joconde
+        FROM {SCHEMA}.joconde
         LIMIT 3
     """))
     
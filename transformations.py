@@ -0,0 +1,17 @@
+import polars as pl
+from datetime import datetime, timezone
+
+
+def enrichir(df, date_import=None):
+    """Transformation commune des orchestrations (transform_data) : année, région normalisée, résumé..."""
+    date_import = date_import or datetime.now(timezone.utc).date()
+    return df.with_columns([
+        pl.col("date_creation").str.extract(r"(\d{4})", 1).cast(pl.Int64, strict=False).alias("annee_creation"),
+        pl.col("region").cast(pl.Utf8).str.to_titlecase().alias("region_normalisee"),
+        pl.when(pl.col("description").str.len_chars() > 200)
+        .then(pl.col("description").str.slice(0, 200) + "...")
+        .otherwise(pl.col("description"))
+        .alias("description_resumee"),
+        pl.col("artiste_sous_droits").is_not_null().alias("artiste_protégé"),
+        pl.lit(date_import).alias("date_import")
+    ])